@@ -1,32 +1,41 @@
+import argparse
+import os
+import signal
 import time
 import logging
-import datetime
-import requests
-from io import BytesIO
-from github import Github
-from PIL import Image, ImageDraw
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
 
-from helpers import read_write_file, has_readme, check_avatar_exists
-from config import github_reponame, github_token, discord_url, website
+import cache
+import metrics
+import snapshot
+import trigger
+from assets import SPRITES, sprite_path
+from avatar import avatar_fresh, prepare_avatar
+from fetcher import DependencyError
+from helpers import has_readme
+from net import session
+from profiles import Profile, load_profiles
+from readme import Readme
+from scheduler import Scheduler
+from settings import (
+    asset_mode,
+    avatar_refresh,
+    fetch_timeout,
+    github_api_url,
+    profile_workers,
+    refresh_intervals,
+    refresh_jitter,
+    trigger_debounce,
+)
 from constructor import (
-    update_mood,
+    JOBS,
+    fetch_data,
     sync_status,
-    update_quote,
-    add_top_songs,
     prepare_layout,
-    add_top_artists,
-    get_user_status,
-    add_recently_played,
 )
 
 
-g = Github(github_token)
-
-user = g.get_user()
-avatar_url = user.avatar_url
-name = user.login
-
 handler = RotatingFileHandler("app.log", maxBytes=1024 * 1024, backupCount=1)
 handler.setLevel(logging.INFO)
 handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
@@ -36,158 +45,281 @@ logging.getLogger("").addHandler(logging.StreamHandler())
 logging.getLogger("").setLevel(logging.INFO)
 
 
-def prepare_avatar(avatar_url, save_path) -> None:
-    try:
-        # Download the avatar image
-        response = requests.get(avatar_url)
-        avatar = Image.open(BytesIO(response.content))
-
-        size = avatar.size
-        mask = Image.new("L", size, 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0, size[0], size[1]), fill=255)
-        avatar.putalpha(mask)
-        cropped_avatar = Image.new("RGBA", size, 0)
-        cropped_avatar.paste(avatar, (0, 0), avatar)
-        cropped_avatar.save(save_path)
-        logging.info("Avatar modified successfully.\n")
-    except Exception as e:
-        logging.info(f"An error occurred while preparing the avatar: {e}\n")
+def _push(profile: Profile, force: bool = False) -> bool:
+    with metrics.phase_seconds.time(profile=profile.name, phase="push"):
+        pushed = profile.publisher.flush(force=force)
+    if pushed:
+        metrics.pushes.inc(profile=profile.name, result="pushed")
+        metrics.last_sync.set(time.time(), profile=profile.name)
+    return pushed
 
 
-def update_readme_file(content: str) -> None:
+def update_readme_file(profile: Profile, content: str, force: bool = False) -> None:
+    publisher = profile.publisher
     try:
-        repo = g.get_repo(github_reponame)
-        gitcontent = repo.get_contents("README.md", ref="main")
-        if gitcontent.decoded_content.decode("utf-8") != content:
-            repo.update_file(
-                gitcontent.path,
-                message="`Update:` Spotify stats.",
-                content=content,
-                sha=gitcontent.sha,
-                branch="main",
-            )
+        staged = publisher.stage("README.md", content)
+        profile.unstaged = False
+        if not staged and not publisher.pending:
+            logging.info("No changes were made to README.md. Reloading.\n")
+            metrics.pushes.inc(profile=profile.name, result="unchanged")
+        elif _push(profile, force=force):
             logging.info("Successfully updated the README.md file with changes.\n")
         else:
-            logging.info("No changes were made to README.md. Reloading.\n")
+            logging.info("README.md changes are waiting for the next commit.\n")
+            metrics.pushes.inc(profile=profile.name, result="deferred")
     except Exception as e:
-        logging.info(f"Failed to update the README.md: {e}\n")
+        logging.error(f"Failed to push README.md of {profile.name}: {e}\n")
+        metrics.pushes.inc(profile=profile.name, result="failed")
 
 
-def upload_image():
+def upload_image(profile: Profile, file_path: str, path: str):
+    # staged with the README, both go out in the next commit
     try:
-        repo = g.get_repo(github_reponame)
-        if check_avatar_exists(repo=repo, github_reponame=github_reponame) == False:
-            with open("files/avatar.png", "rb") as file:
-                content = file.read()
-            repo.create_file(
-                path="avatar.png",
-                message="`Add:` avatar.",
-                content=content,
-                branch="main",
-            )
-            logging.info(f"Successfully uploaded avatar to {github_reponame}!\n")
+        with open(file_path, "rb") as file:
+            content = file.read()
+        if profile.publisher.stage(path, content):
+            logging.info(f"{path} will be uploaded to {profile.github_reponame}.\n")
     except FileNotFoundError as e:
-        logging.info(f"Error uploading avatar: File not found - {e}\n")
+        logging.warning(f"Error uploading {path}: File not found - {e}\n")
     except Exception as e:
-        logging.info(f"Error uploading avatar to {github_reponame}: {e}\n")
+        logging.error(f"Error uploading {path} to {profile.github_reponame}: {e}\n")
 
 
-def prepare_files():
+def prepare_files(profile: Profile, name: str):
     try:
-        repo = g.get_repo("sxoxgxi/sxoxgxi")
-        data = repo.get_contents("README.md", ref="main")
+        session.throttle(github_api_url)
+        with metrics.api_call("github.get_repo"):
+            repo = profile.github.get_repo("sxoxgxi/sxoxgxi")
+        session.throttle(github_api_url)
+        with metrics.api_call("github.get_contents"):
+            data = repo.get_contents("README.md", ref="main")
         updated_data = data.decoded_content.decode("utf-8").replace(
             "<img src='https://profile-counter.glitch.me/sxoxgxi/count.svg'>",
             f"<img src='https://profile-counter.glitch.me/{name}/count.svg'>",
         )
-        if has_readme(data=updated_data):
+        if has_readme(data=updated_data, folder_path=profile.files_dir):
             pass
     except UnicodeEncodeError as e:
-        logging.info(f"Error encoding README.md content: {e}\n")
+        logging.error(f"Error encoding README.md content: {e}\n")
         return
     except Exception as e:
-        logging.info(f"Error preparing files: {e}\n")
+        logging.error(f"Error preparing files of {profile.name}: {e}\n")
         return
 
 
-def _initialize_page():
-    prepare_files()
-    prepare_avatar(avatar_url=avatar_url, save_path="files/avatar.png")
-    prepare_layout(website=website, discord_url=discord_url, avatar_url="avatar.png")
-    upload_image()
-    update_quote()
-    logging.info("Files initialized successfully\n")
+def _initialize_page(profile: Profile) -> None:
+    # the GitHub user is only asked for when the README template is missing
+    # or the avatar is due for a check, a restart otherwise makes no request
+    readme_path, avatar_path = profile.path("README.md"), profile.path("avatar.png")
+    missing = not os.path.exists(readme_path)
+    if missing or not avatar_fresh(avatar_path, avatar_refresh):
+        # the user is loaded lazily, on the first attribute read
+        session.throttle(github_api_url)
+        with metrics.api_call("github.get_user"):
+            user = profile.github.get_user()
+            login, avatar_url = user.login, user.avatar_url
+        if missing:
+            prepare_files(profile, name=login)
+        try:
+            prepare_avatar(avatar_url=avatar_url, save_path=avatar_path)
+        except Exception as e:
+            logging.warning(f"Could not prepare the avatar of {profile.name}: {e}\n")
+    profile.readme = Readme.load(readme_path)
+    prepare_layout(profile, avatar_url="avatar.png")
+    upload_image(profile, avatar_path, "avatar.png")
+    profile.readme.save()
+    # a README written but not pushed before a crash goes out with the next push
+    profile.unstaged = True
+    logging.info(f"Files of {profile.name} initialized successfully\n")
 
 
-def main():
+def initialize(profile: Profile) -> dict:
+    # returns when each job is due, as saved by the previous run
     try:
-        _initialize_page()
+        _initialize_page(profile)
     except Exception as e:
-        logging.info(f"Could not initialize the file: {e}\n")
+        logging.error(f"Could not initialize the files of {profile.name}: {e}\n")
+        profile.readme = Readme.load(profile.path("README.md"))
+    return snapshot.restore(profile)
+
 
+def run_cycle(profile: Profile, jobs: list) -> dict:
+    readme = profile.readme
+    # a refresh asked for through the trigger is committed right away instead
+    # of waiting for the quiet window and the next push
+    triggered = profile.triggered.intersection(jobs)
+    profile.triggered.difference_update(triggered)
     try:
-        while True:
-            now = datetime.datetime.now()
-            sleep_time = max(0, 10 - now.second % 10)
-            time.sleep(sleep_time)
-            # get the Spotify user status
-            try:
-                if get_user_status():
-                    logging.info("User Online\n")
-                else:
-                    logging.info("User Online\n")
-            except Exception as e:
-                logging.info(f"Error updating user status: {e}\n")
+        if readme.reload_if_changed():
+            for section in profile.sections:
+                section.invalidate()
+    except Exception as e:
+        logging.error(f"Error reloading {readme.path}: {e}\n")
 
+    # fetch every dataset the due sections need at once, each one once, and
+    # render once all data is in
+    due = {name for job in jobs for name in JOBS.get(job, ())}
+    names = [name for s in profile.sections if s.name in due for name in s.needs]
+    with metrics.phase_seconds.time(profile=profile.name, phase="fetch"):
+        data, errors = fetch_data(profile, names, timeout=fetch_timeout)
+    for name, e in errors.items():
+        if isinstance(e, DependencyError):
+            logging.warning(f"Skipped {name} for {profile.name}: {e}\n")
+            continue
+        logging.error(f"Error fetching {name} for {profile.name}: {e}\n")
+        metrics.fetch_errors.inc(profile=profile.name, dataset=name)
+
+    # pick when to look at the user status again
+    delays = {}
+    if "playing" in data:
+        delays["status"] = profile.poller.next_delay(data["playing"])
+
+    # only sections whose data changed are rendered again; a failed dataset
+    # fails just the sections that need it
+    for section in profile.sections:
+        if any(name in errors for name in section.needs):
+            section.fail()
+        elif all(name in data for name in section.needs) and section.update(
+            tuple(data[name] for name in section.needs)
+        ):
             try:
-                try:
-                    layout_recents = add_recently_played()
-                except Exception as e:
-                    logging.info(f"Error adding recently played songs: {e}\n")
-                try:
-                    layout_artists = add_top_artists()
-                except Exception as e:
-                    logging.info(f"Error adding recently played songs: {e}\n")
-                try:
-                    layout_songs = add_top_songs()
-                except Exception as e:
-                    logging.info(f"Error adding recently played songs: {e}\n")
-                try:
-                    update_mood()
-                except Exception as e:
-                    logging.info(f"Error adding recently played songs: {e}\n")
-            except Exception as e:
-                logging.info(
-                    f"Error updating Spotify status or adding tracks/artists/songs/mood: {e}\n"
-                )
-            try:
-                if not layout_recents or not layout_artists or not layout_songs:
-                    try:
-                        sync_status(condi=False)
-                    except Exception as e:
-                        logging.info(f"Error updating layout sync status: {e}\n")
-                else:
-                    try:
-                        sync_status(condi=True)
-                    except Exception as e:
-                        logging.info(f"Error updating layout sync status: {e}\n")
-            except Exception as e:
-                logging.info(f"Error updating layout sync status: {e}\n")
-            # update the README file
-            try:
-                pushfile = read_write_file(file_path="files/README.md", mode="r")
-                update_readme_file(pushfile)
+                with metrics.phase_seconds.time(profile=profile.name, phase="render"):
+                    result = section.apply(profile)
             except Exception as e:
-                logging.info(f"Error updating README file: {e}\n")
+                logging.error(f"Error rendering the {section.name} section: {e}\n")
+                metrics.render_errors.inc(profile=profile.name, section=section.name)
+                continue
+            if section.name == "status":
+                logging.info("User Online\n" if result else "User Offline\n")
 
-            # sleep until the next 10-second interval
-            now = datetime.datetime.now()
-            sleep_time = max(0, 10 - now.second % 10)
-            time.sleep(sleep_time)
+    try:
+        synced = all(s.healthy for s in profile.sections if s.layout)
+        sync_status(profile, condi=synced)
+    except Exception as e:
+        logging.error(f"Error updating layout sync status: {e}\n")
+
+    # write and stage the README only if a section changed
+    try:
+        with metrics.phase_seconds.time(profile=profile.name, phase="splice"):
+            saved = readme.save()
+        # staged again next cycle if staging fails, e.g. while GitHub is down
+        if saved:
+            profile.unstaged = True
+        if profile.unstaged:
+            if asset_mode == "sprite":
+                for section in SPRITES:
+                    path = sprite_path(profile.files_dir, section)
+                    if os.path.exists(path):
+                        upload_image(profile, path, f"{section}.png")
+            update_readme_file(profile, readme.text(), force=bool(triggered))
+        elif _push(profile, force=bool(triggered)):
+            logging.info("Successfully pushed the README.md changes held back.\n")
+    except Exception as e:
+        logging.error(f"Error saving {readme.path}: {e}\n")
+    # idle cycles count too, so a stalled profile stands out from a quiet one
+    if not profile.unstaged and not profile.publisher.pending:
+        metrics.last_sync.set(time.time(), profile=profile.name)
+    metrics.write_textfile()
+    return delays
+
+
+def _flush_pending(profiles: list) -> None:
+    for profile in profiles:
+        try:
+            _push(profile, force=True)
+        except Exception as e:
+            logging.error(f"Failed to push pending changes of {profile.name}: {e}\n")
+
+
+def run_once(profile: Profile) -> None:
+    due = initialize(profile)
+    now = time.time()
+    jobs = [job for job in refresh_intervals if due.get(job, now) <= now]
+    delays = run_cycle(profile, jobs)
+    _flush_pending([profile])
+    for job in jobs:
+        due[job] = now + delays.get(job, refresh_intervals[job])
+    snapshot.save(profile, due, refresh_intervals)
+
+
+def main(argv: list | None = None):
+    parser = argparse.ArgumentParser(
+        description="Keep GitHub profile READMEs in sync with Spotify."
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="run the jobs that are due once, push and exit (for cron)",
+    )
+    args = parser.parse_args(argv)
+
+    profiles = {profile.name: profile for profile in load_profiles()}
+    if args.once:
+        with ThreadPoolExecutor(profile_workers) as pool:
+            list(pool.map(run_once, profiles.values()))
+        cache.flush()
+        return
+
+    metrics.serve()
+    with ThreadPoolExecutor(profile_workers) as pool:
+        due = dict(zip(profiles, pool.map(initialize, profiles.values())))
+
+    # jobs are (profile name, job); each profile's due jobs run as one cycle
+    scheduler = Scheduler(
+        jitter=refresh_jitter,
+        workers=profile_workers if len(profiles) > 1 else 0,
+        group=lambda job: job[0],
+    )
+    now = time.time()
+    for name in profiles:
+        for job, interval in refresh_intervals.items():
+            # resume the saved schedule, but never wait more than one interval
+            delay = min(max(due[name].get(job, now) - now, 0), interval)
+            scheduler.every((name, job), interval, delay=delay)
+
+    def save_snapshot(jobs: list) -> None:
+        name = jobs[0][0]
+        due = {job: at for (p, job), at in scheduler.due_times().items() if p == name}
+        snapshot.save(profiles[name], due, refresh_intervals)
+
+    scheduler.after_run(save_snapshot)
+    scheduler.on_shutdown(lambda: _flush_pending(list(profiles.values())))
+    scheduler.on_shutdown(cache.flush)
+
+    # the first job refreshing each section, for refreshes asked for locally
+    section_jobs = {}
+    for job, sections in JOBS.items():
+        for section in sections:
+            section_jobs.setdefault(section, job)
+
+    def refresh(names: list, sections: list) -> list:
+        # requests within trigger_debounce seconds share one run of each job
+        for name in names:
+            if name not in profiles:
+                raise KeyError(f"profile '{name}'")
+        for section in sections:
+            if section not in section_jobs:
+                raise KeyError(f"section '{section}'")
+        jobs = dict.fromkeys(section_jobs[s] for s in sections or section_jobs)
+        scheduled = [[name, job] for name in names or profiles for job in jobs]
+        for name, job in scheduled:
+            profiles[name].triggered.add(job)
+            scheduler.schedule((name, job), trigger_debounce)
+        return scheduled
+
+    servers = trigger.serve(refresh)
+    scheduler.on_shutdown(lambda: trigger.close(servers))
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+
+    def run_profile(due: list) -> dict:
+        name = due[0][0]
+        delays = run_cycle(profiles[name], [job for _, job in due])
+        return {(name, job): delay for job, delay in delays.items()}
+
+    try:
+        scheduler.run(run_profile)
     except KeyboardInterrupt:
         logging.info("Interrupted by user. Exiting...\n")
-        return
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+import logging
+import os
+from io import BytesIO
+
+from helpers import write_atomic
+from net import session
+from settings import thumbnail_width
+from templates import fingerprint
+
+# sections that can be drawn from a single strip image in "sprite" mode
+SPRITES = ("recentlyplayed", "topartists")
+
+
+def sprite_path(files_dir: str, section: str) -> str:
+    return os.path.join(files_dir, f"{section}.png")
+
+
+def _built_from(key_path: str) -> str | None:
+    try:
+        with open(key_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def build_sprite(files_dir: str, section: str, urls: list) -> str:
+    # one row of covers, each centered in a slot twice its width so the
+    # strip lines up with the link cells of the table below it. The hash of
+    # the covers is kept next to the strip, which is only rebuilt when they
+    # change, not every time the section is rendered.
+    path = sprite_path(files_dir, section)
+    key, key_path = fingerprint((thumbnail_width, urls)), f"{path}.sha1"
+    if os.path.exists(path) and _built_from(key_path) == key:
+        return f"{section}.png"
+
+    from PIL import Image, ImageOps
+
+    slot = thumbnail_width * 2
+    strip = Image.new("RGBA", (slot * len(urls), thumbnail_width), 0)
+    for i, url in enumerate(urls):
+        response = session.get(url)
+        response.raise_for_status()
+        cover = Image.open(BytesIO(response.content)).convert("RGBA")
+        cover = ImageOps.fit(
+            cover, (thumbnail_width, thumbnail_width), Image.Resampling.LANCZOS
+        )
+        strip.paste(cover, (i * slot + thumbnail_width // 2, 0))
+    buffer = BytesIO()
+    strip.save(buffer, format="PNG", optimize=True)
+    write_atomic(path, buffer.getvalue())
+    write_atomic(key_path, key)
+    logging.info(f"Rebuilt the {section} sprite from {len(urls)} covers.\n")
+    return f"{section}.png"
@@ -1,8 +1,7 @@
 import spotipy
+from spotipy.cache_handler import CacheFileHandler
 from spotipy.oauth2 import SpotifyOAuth
 
-from config import client_secret, client_id, redirect_uri
-
 
 scopes = [
     "user-follow-read",
@@ -26,26 +25,48 @@ scopes = [
     "playlist-read-private",
     "playlist-modify-public",
 ]
-sp = spotipy.Spotify(
-    auth_manager=SpotifyOAuth(
-        client_id=client_id,
-        client_secret=client_secret,
-        redirect_uri=redirect_uri,
-        scope=scopes,
+
+
+def make_client(
+    client_id: str,
+    client_secret: str,
+    redirect_uri: str,
+    cache_path: str = ".cache",
+    session=True,
+    timeout=5,
+    prefix: str = "https://api.spotify.com/v1/",
+) -> spotipy.Spotify:
+    client = spotipy.Spotify(
+        auth_manager=SpotifyOAuth(
+            client_id=client_id,
+            client_secret=client_secret,
+            redirect_uri=redirect_uri,
+            scope=scopes,
+            cache_handler=CacheFileHandler(cache_path=cache_path),
+            # token refreshes share the pool and must not hang a profile either
+            requests_session=session,
+            requests_timeout=timeout,
+        ),
+        requests_session=session,
+        requests_timeout=timeout,
     )
-)
+    client.prefix = prefix
+    return client
 
 
-def profile() -> dict:
+def profile(sp: spotipy.Spotify) -> dict:
     return sp.current_user()
 
 
 def main():
-    user_profile = profile()
-    user_name = user_profile["display_name"]
-    print(
-        f"{user_name} authenticated successfully!\nNow run python app.py to get started."
-    )
+    # every configured profile is authenticated once, tokens are cached
+    from profiles import load_profiles
+
+    for user in load_profiles():
+        user_profile = profile(user.sp)
+        user_name = user_profile["display_name"]
+        print(f"{user_name} authenticated successfully!")
+    print("Now run python app.py to get started.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from io import BytesIO
+
+from helpers import write_atomic
+from net import session
+
+AVATAR_SIZE = 200  # display width used by prepare_layout
+SUPERSAMPLE = 4  # the mask is drawn this many times larger, then downscaled
+
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path: str, state: dict) -> None:
+    try:
+        write_atomic(path, json.dumps(state))
+    except OSError as e:
+        logging.warning(f"Could not save avatar state: {e}\n")
+
+
+def process_avatar(content: bytes) -> bytes:
+    # crop to a square at display size, then cut an anti-aliased circle
+    from PIL import Image, ImageDraw, ImageOps
+
+    avatar = Image.open(BytesIO(content)).convert("RGBA")
+    avatar = ImageOps.fit(avatar, (AVATAR_SIZE, AVATAR_SIZE), Image.Resampling.LANCZOS)
+
+    big = AVATAR_SIZE * SUPERSAMPLE
+    mask = Image.new("L", (big, big), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, big - 1, big - 1), fill=255)
+    mask = mask.resize((AVATAR_SIZE, AVATAR_SIZE), Image.Resampling.LANCZOS)
+
+    cropped_avatar = Image.new("RGBA", avatar.size, 0)
+    cropped_avatar.paste(avatar, (0, 0), mask)
+    output = BytesIO()
+    cropped_avatar.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def avatar_fresh(save_path: str, max_age: float) -> bool:
+    # whether save_path was checked against its source less than max_age ago
+    if not os.path.exists(save_path):
+        return False
+    state = _load_state(f"{os.path.splitext(save_path)[0]}.json")
+    return time.time() - state.get("checked_at", 0) < max_age
+
+
+def prepare_avatar(avatar_url: str, save_path: str) -> bool:
+    # returns True if a new avatar was written to save_path
+    state_path = f"{os.path.splitext(save_path)[0]}.json"
+    state = _load_state(state_path) if os.path.exists(save_path) else {}
+    headers = {}
+    if state.get("url") == avatar_url:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    response = session.get(avatar_url, headers=headers)
+    if response.status_code == 304:
+        logging.info("Avatar unchanged, skipping image processing.\n")
+        _save_state(state_path, {**state, "checked_at": time.time()})
+        return False
+    response.raise_for_status()
+
+    digest = hashlib.sha256(response.content).hexdigest()
+    changed = digest != state.get("source_sha256")
+    if changed:
+        write_atomic(save_path, process_avatar(response.content))
+        logging.info("Avatar modified successfully.\n")
+    else:
+        logging.info("Avatar unchanged, skipping image processing.\n")
+
+    _save_state(
+        state_path,
+        {
+            "url": avatar_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "source_sha256": digest,
+            "checked_at": time.time(),
+        },
+    )
+    return changed
@@ -0,0 +1,648 @@
+# Local stand-in for the Spotify, GitHub and quote APIs this project calls.
+#
+#   python bench/fakeapi.py --port 8765 --latency 80 --error-rate 0.01
+#
+# Point spotify_api_url, github_api_url and quote_url at it (see
+# bench/simulate.py). Spotify data comes from bench/fixtures and follows a
+# simulated listening session; GitHub repositories live in memory and get
+# the README fixture on first use. Latency, errors and rate limiting are
+# injected on every API request.
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+QUOTES = [
+    ("Raise your words, not voice. It is rain that grows flowers.", "Rumi"),
+    ("Simplicity is prerequisite for reliability.", "Edsger Dijkstra"),
+    ("Where words fail, music speaks.", "Hans Christian Andersen"),
+]
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read() if name.endswith(".md") else json.load(f)
+
+
+def blob_sha(content: bytes) -> str:
+    return hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
+
+
+def make_png(size: int = 64, color: tuple = (29, 185, 84)) -> bytes:
+    # a solid square, enough for the avatar processing to chew on
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    row = b"\0" + bytes(color) * size
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * size))
+        + chunk(b"IEND", b"")
+    )
+
+
+class Faults:
+    """Latency, server errors and rate limiting injected into API calls."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0):
+        self.latency = latency  # seconds
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(0)
+
+    def delay(self) -> float:
+        return max(0.0, self.random.gauss(self.latency, self.jitter))
+
+    def pick(self) -> str | None:
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limit"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return None
+
+
+class Listening:
+    """A listener cycling through the top tracks on a simulated clock.
+
+    They listen for ``session`` seconds, then stay offline for ``pause``
+    seconds. ``speed`` simulated seconds pass per real second.
+    """
+
+    def __init__(self, tracks: list, speed: float = 1.0, session=2700, pause=900):
+        self.tracks = tracks
+        self.speed = speed
+        self.session = session
+        self.pause = pause
+        self.started = time.time()
+        self._real_start = time.monotonic()
+
+    def now(self) -> float:
+        return self.started + (time.monotonic() - self._real_start) * self.speed
+
+    def plays(self, until: float) -> list:
+        # (started_at, track) of every play up to `until`, oldest first
+        plays, clock, i = [], self.started - self.session - self.pause, 0
+        while clock < until:
+            session_end = clock + self.session
+            while clock < min(session_end, until):
+                track = self.tracks[i % len(self.tracks)]
+                plays.append((clock, track))
+                clock += track["duration_ms"] / 1000
+                i += 1
+            clock = max(clock, session_end) + self.pause
+        return plays
+
+    def playing(self) -> dict | None:
+        now = self.now()
+        plays = self.plays(now)
+        if not plays:
+            return None
+        started, track = plays[-1]
+        progress = (now - started) * 1000
+        if progress >= track["duration_ms"]:
+            return None  # between sessions
+        return {
+            "timestamp": int(started * 1000),
+            "context": None,
+            "progress_ms": int(progress),
+            "item": track,
+            "currently_playing_type": "track",
+            "actions": {"disallows": {"resuming": True}},
+            "is_playing": True,
+        }
+
+    def recently_played(self, limit: int, after=None, before=None) -> dict:
+        now = self.now()
+        finished = [
+            (started + track["duration_ms"] / 1000, track)
+            for started, track in self.plays(now)
+            if started + track["duration_ms"] / 1000 <= now
+        ]
+        items = [
+            {
+                "track": track,
+                "played_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ended))
+                + f".{int(ended * 1000) % 1000:03d}Z",
+                "played_at_ms": int(ended * 1000),
+                "context": None,
+            }
+            for ended, track in finished
+        ]
+        if after is not None:
+            items = [item for item in items if item["played_at_ms"] > after][:limit]
+        else:
+            if before is not None:
+                items = [item for item in items if item["played_at_ms"] < before]
+            items = items[-limit:]
+        items.reverse()
+        cursors = None
+        if items:
+            cursors = {
+                "after": str(items[0]["played_at_ms"]),
+                "before": str(items[-1]["played_at_ms"]),
+            }
+        for item in items:
+            del item["played_at_ms"]
+        return {"items": items, "cursors": cursors, "limit": limit, "next": None}
+
+
+class Repository:
+    """An in-memory repository: blobs, trees, commits and one branch."""
+
+    def __init__(self, full_name: str, files: dict, branch: str = "main") -> None:
+        self.full_name = full_name
+        self.branch = branch
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.head = self.commit(self.tree(files), [], "Initial commit")
+        self.lock = threading.Lock()
+
+    def blob(self, content: bytes) -> str:
+        sha = blob_sha(content)
+        self.blobs[sha] = content
+        return sha
+
+    def tree(self, files: dict, base: str | None = None) -> str:
+        # files maps path -> blob sha; bytes are stored as new blobs
+        entries = dict(self.trees[base]) if base else {}
+        for path, value in files.items():
+            entries[path] = self.blob(value) if isinstance(value, bytes) else value
+        sha = hashlib.sha1(repr(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = entries
+        return sha
+
+    def commit(self, tree: str, parents: list, message: str) -> str:
+        key = f"{tree}{parents}{message}{time.time()}"
+        sha = hashlib.sha1(key.encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def files(self) -> dict:
+        return self.trees[self.commits[self.head]["tree"]]
+
+
+class FakeAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, faults: Faults, speed: float = 1.0) -> None:
+        super().__init__(address, Handler)
+        self.faults = faults
+        self.base = f"http://{self.server_address[0]}:{self.server_address[1]}"
+        top_tracks = load_fixture("top_tracks.json")
+        self.top_tracks = top_tracks
+        self.top_artists = load_fixture("top_artists.json")
+        self.features = {f["id"]: f for f in load_fixture("audio_features.json")}
+        self.readme = load_fixture("README.md").encode("utf-8")
+        self.listening = Listening(top_tracks["items"], speed=speed)
+        self.avatar = make_png()
+        self.repos = {}
+        self.calls = Counter()  # endpoint -> requests
+        self.statuses = Counter()  # (endpoint, status) -> responses
+        self.commits_made = 0
+        self._lock = threading.Lock()
+
+    def repo(self, full_name: str) -> Repository:
+        with self._lock:
+            if full_name not in self.repos:
+                files = {"README.md": self.readme}
+                self.repos[full_name] = Repository(full_name, files)
+            return self.repos[full_name]
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "statuses": {f"{e} {s}": n for (e, s), n in self.statuses.items()},
+            "commits": self.commits_made,
+        }
+
+
+def fakeartist(artist_id: str) -> dict:
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id[:6]}",
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+        "images": [{"url": f"https://i.scdn.co/image/{artist_id}", "width": 640}],
+    }
+
+
+def _float(value, default=None):
+    return default if value is None else float(value)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeAPI
+
+    # (method, pattern, handler name, endpoint label)
+    ROUTES = [
+        ("GET", r"/v1/me/player/currently-playing", "playing", "spotify.playing"),
+        ("GET", r"/v1/me/player", "playing", "spotify.playing"),
+        (
+            "GET",
+            r"/v1/me/player/recently-played",
+            "recently_played",
+            "spotify.recently_played",
+        ),
+        ("GET", r"/v1/me/top/artists", "top_artists", "spotify.top_artists"),
+        ("GET", r"/v1/me/top/tracks", "top_tracks", "spotify.top_tracks"),
+        ("GET", r"/v1/audio-features/?", "audio_features", "spotify.audio_features"),
+        ("GET", r"/v1/artists/?", "artists", "spotify.artists"),
+        ("GET", r"/v1/me", "me", "spotify.me"),
+        ("GET", r"/api/quotes", "quotes", "quote"),
+        ("GET", r"/avatars/(?P<login>[^/]+)", "avatar", "avatar"),
+        ("GET", r"/user", "user", "github.get_user"),
+        ("GET", r"/repos/(?P<repo>[^/]+/[^/]+)", "get_repo", "github.get_repo"),
+        (
+            "GET",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/contents/(?P<path>.+)",
+            "get_contents",
+            "github.get_contents",
+        ),
+        (
+            "PUT",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/contents/(?P<path>.+)",
+            "put_contents",
+            "github.put_contents",
+        ),
+        (
+            "GET",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/git/refs?/heads/(?P<branch>.+)",
+            "get_ref",
+            "github.get_git_ref",
+        ),
+        (
+            "PATCH",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/git/refs/heads/(?P<branch>.+)",
+            "update_ref",
+            "github.update_ref",
+        ),
+        (
+            "GET",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/git/commits/(?P<sha>\w+)",
+            "get_commit",
+            "github.get_git_commit",
+        ),
+        (
+            "POST",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/git/blobs",
+            "create_blob",
+            "github.create_git_blob",
+        ),
+        (
+            "POST",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/git/trees",
+            "create_tree",
+            "github.create_git_tree",
+        ),
+        (
+            "POST",
+            r"/repos/(?P<repo>[^/]+/[^/]+)/git/commits",
+            "create_commit",
+            "github.create_git_commit",
+        ),
+    ]
+    ROUTES = [
+        (method, re.compile(pattern + "$"), name, endpoint)
+        for method, pattern, name, endpoint in ROUTES
+    ]
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:
+        self.dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self.dispatch("PUT")
+
+    def do_PATCH(self) -> None:
+        self.dispatch("PATCH")
+
+    def dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.body = json.loads(body) if body else {}
+        for route_method, pattern, name, endpoint in self.ROUTES:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                break
+        else:
+            self.send_json(404, {"message": "Not Found"}, "unknown")
+            return
+
+        self.endpoint = endpoint
+        self.server.calls[endpoint] += 1
+        faults = self.server.faults
+        time.sleep(faults.delay())
+        fault = faults.pick()
+        if fault == "error":
+            self.send_json(502, {"message": "Bad Gateway"})
+        elif fault == "rate_limit" and endpoint.startswith("github"):
+            # GitHub's secondary rate limit answer
+            self.send_json(
+                403,
+                {"message": "You have exceeded a secondary rate limit."},
+                headers={"Retry-After": "1"},
+            )
+        elif fault == "rate_limit":
+            self.send_json(
+                429, {"error": {"status": 429}}, headers={"Retry-After": "1"}
+            )
+        else:
+            getattr(self, f"handle_{name}")(**match.groupdict())
+
+    def send_json(self, status, data=None, endpoint=None, headers=None) -> None:
+        body = b"" if data is None else json.dumps(data).encode("utf-8")
+        self.send_body(status, body, "application/json", endpoint, headers)
+
+    def send_body(self, status, body, kind, endpoint=None, headers=None) -> None:
+        self.server.statuses[(endpoint or self.endpoint, status)] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Spotify
+
+    def handle_playing(self) -> None:
+        playing = self.server.listening.playing()
+        if playing is None:
+            self.send_body(204, b"", "application/json")
+        else:
+            self.send_json(200, playing)
+
+    def handle_recently_played(self) -> None:
+        self.send_json(
+            200,
+            self.server.listening.recently_played(
+                limit=int(self.query.get("limit", 20)),
+                after=_float(self.query.get("after")),
+                before=_float(self.query.get("before")),
+            ),
+        )
+
+    def _top(self, page: dict) -> None:
+        limit = int(self.query.get("limit", 20))
+        offset = int(self.query.get("offset", 0))
+        self.send_json(200, {**page, "items": page["items"][offset : offset + limit]})
+
+    def handle_top_artists(self) -> None:
+        self._top(self.server.top_artists)
+
+    def handle_top_tracks(self) -> None:
+        self._top(self.server.top_tracks)
+
+    def handle_audio_features(self) -> None:
+        ids = self.query.get("ids", "").split(",")
+        features = self.server.features
+        self.send_json(200, {"audio_features": [features.get(i) for i in ids]})
+
+    def handle_artists(self) -> None:
+        ids = self.query.get("ids", "").split(",")
+        artists = {a["id"]: a for a in self.server.top_artists["items"]}
+        self.send_json(
+            200,
+            {
+                "artists": [artists.get(i) or fakeartist(i) for i in ids if i]
+            },
+        )
+
+    def handle_me(self) -> None:
+        self.send_json(200, {"display_name": "Fake Listener", "id": "fake"})
+
+    def handle_quotes(self) -> None:
+        quote, author = random.choice(QUOTES)
+        self.send_json(200, [{"q": quote, "a": author}])
+
+    def handle_avatar(self, login: str) -> None:
+        etag = f'"{hashlib.sha1(self.server.avatar).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_body(304, b"", "image/png", headers={"ETag": etag})
+        else:
+            self.send_body(200, self.server.avatar, "image/png", headers={"ETag": etag})
+
+    # GitHub
+
+    def login(self) -> str:
+        # tokens look like "token <login>:..." in simulations, any works
+        token = self.headers.get("Authorization", "").split(" ")[-1]
+        return token.split(":")[0] or "fake"
+
+    def handle_user(self) -> None:
+        login = self.login()
+        self.send_json(
+            200,
+            {
+                "login": login,
+                "id": 1,
+                "url": f"{self.server.base}/user",
+                "avatar_url": f"{self.server.base}/avatars/{login}",
+                "type": "User",
+            },
+        )
+
+    def repo_json(self, repo: Repository) -> dict:
+        owner = repo.full_name.split("/")[0]
+        return {
+            "id": 1,
+            "name": repo.full_name.split("/")[1],
+            "full_name": repo.full_name,
+            "owner": {"login": owner, "url": f"{self.server.base}/users/{owner}"},
+            "url": f"{self.server.base}/repos/{repo.full_name}",
+            "default_branch": repo.branch,
+            "private": False,
+        }
+
+    def handle_get_repo(self, repo: str) -> None:
+        self.send_json(200, self.repo_json(self.server.repo(repo)))
+
+    def content_json(self, repo: Repository, path: str, sha: str) -> dict:
+        return {
+            "type": "file",
+            "encoding": "base64",
+            "name": path.rsplit("/", 1)[-1],
+            "path": path,
+            "sha": sha,
+            "size": len(repo.blobs[sha]),
+            "content": base64.b64encode(repo.blobs[sha]).decode("ascii"),
+            "url": f"{self.server.base}/repos/{repo.full_name}/contents/{path}",
+        }
+
+    def handle_get_contents(self, repo: str, path: str) -> None:
+        repo = self.server.repo(repo)
+        with repo.lock:
+            sha = repo.files().get(path)
+            if sha is None:
+                self.send_json(404, {"message": "Not Found"})
+                return
+            etag = f'"{sha}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_body(304, b"", "application/json", headers={"ETag": etag})
+                return
+            data = self.content_json(repo, path, sha)
+        self.send_json(200, data, headers={"ETag": etag})
+
+    def handle_put_contents(self, repo: str, path: str) -> None:
+        # create_file and update_file
+        repo = self.server.repo(repo)
+        with repo.lock:
+            current = repo.files().get(path)
+            if current is not None and self.body.get("sha") != current:
+                self.send_json(409, {"message": f"{path} does not match"})
+                return
+            content = base64.b64decode(self.body["content"])
+            tree = repo.tree({path: content}, base=repo.commits[repo.head]["tree"])
+            repo.head = repo.commit(tree, [repo.head], self.body.get("message", ""))
+            self.server.commits_made += 1
+            data = {
+                "content": self.content_json(repo, path, blob_sha(content)),
+                "commit": self.commit_json(repo, repo.head),
+            }
+        self.send_json(201 if current is None else 200, data)
+
+    def handle_get_ref(self, repo: str, branch: str) -> None:
+        repo = self.server.repo(repo)
+        url = f"{self.server.base}/repos/{repo.full_name}/git"
+        self.send_json(
+            200,
+            {
+                "ref": f"refs/heads/{branch}",
+                "url": f"{url}/refs/heads/{branch}",
+                "object": {
+                    "sha": repo.head,
+                    "type": "commit",
+                    "url": f"{url}/commits/{repo.head}",
+                },
+            },
+        )
+
+    def handle_update_ref(self, repo: str, branch: str) -> None:
+        repo = self.server.repo(repo)
+        with repo.lock:
+            sha = self.body["sha"]
+            if sha not in repo.commits:
+                self.send_json(422, {"message": "Object does not exist"})
+                return
+            if not self.body.get("force") and repo.head not in (
+                repo.commits[sha]["parents"]
+            ):
+                self.send_json(422, {"message": "Update is not a fast forward"})
+                return
+            repo.head = sha
+            self.server.commits_made += 1
+        self.handle_get_ref(repo.full_name, branch)
+
+    def commit_json(self, repo: Repository, sha: str) -> dict:
+        url = f"{self.server.base}/repos/{repo.full_name}/git"
+        commit = repo.commits[sha]
+        return {
+            "sha": sha,
+            "url": f"{url}/commits/{sha}",
+            "message": commit["message"],
+            "tree": {"sha": commit["tree"], "url": f"{url}/trees/{commit['tree']}"},
+            "parents": [
+                {"sha": parent, "url": f"{url}/commits/{parent}"}
+                for parent in commit["parents"]
+            ],
+        }
+
+    def handle_get_commit(self, repo: str, sha: str) -> None:
+        repo = self.server.repo(repo)
+        if sha not in repo.commits:
+            self.send_json(404, {"message": "Not Found"})
+            return
+        self.send_json(200, self.commit_json(repo, sha))
+
+    def handle_create_blob(self, repo: str) -> None:
+        repo = self.server.repo(repo)
+        content = self.body["content"]
+        if self.body.get("encoding") == "base64":
+            content = base64.b64decode(content)
+        else:
+            content = content.encode("utf-8")
+        with repo.lock:
+            sha = repo.blob(content)
+        url = f"{self.server.base}/repos/{repo.full_name}/git/blobs/{sha}"
+        self.send_json(201, {"sha": sha, "url": url})
+
+    def handle_create_tree(self, repo: str) -> None:
+        repo = self.server.repo(repo)
+        with repo.lock:
+            files = {entry["path"]: entry["sha"] for entry in self.body["tree"]}
+            sha = repo.tree(files, base=self.body.get("base_tree"))
+            entries = repo.trees[sha]
+        url = f"{self.server.base}/repos/{repo.full_name}/git/trees/{sha}"
+        self.send_json(
+            201,
+            {
+                "sha": sha,
+                "url": url,
+                "tree": [
+                    {"path": path, "mode": "100644", "type": "blob", "sha": blob}
+                    for path, blob in entries.items()
+                ],
+            },
+        )
+
+    def handle_create_commit(self, repo: str) -> None:
+        repo = self.server.repo(repo)
+        with repo.lock:
+            sha = repo.commit(
+                self.body["tree"], self.body.get("parents", []), self.body["message"]
+            )
+            data = self.commit_json(repo, sha)
+        self.send_json(201, data)
+
+
+def serve(port: int = 0, faults: Faults | None = None, speed: float = 1.0):
+    server = FakeAPI(("127.0.0.1", port), faults or Faults(), speed=speed)
+    threading.Thread(target=server.serve_forever, name="fakeapi", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Spotify and GitHub APIs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0, help="mean, in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="std dev, in ms")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0)
+    parser.add_argument("--speed", type=float, default=1, help="simulated s per s")
+    args = parser.parse_args()
+    faults = Faults(
+        args.latency / 1000, args.jitter / 1000, args.error_rate, args.rate_limit_rate
+    )
+    server = FakeAPI(("127.0.0.1", args.port), faults, speed=args.speed)
+    print(f"Serving on {server.base}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# Offline micro-benchmarks for the code that runs on every refresh cycle.
+#
+#   python bench/run.py                      # writes bench/results.json
+#   python bench/run.py --compare old.json   # exits 1 on a regression
+#
+# Everything runs on the recorded payloads in bench/fixtures, no request is
+# made. Without a config.py, example.config.py is used for the settings.
+# startup.import times a cold import in fresh interpreters, with their peak RSS.
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "bench", "fixtures")
+sys.path.insert(0, ROOT)
+
+if importlib.util.find_spec("config") is None:
+    spec = importlib.util.spec_from_file_location(
+        "config", os.path.join(ROOT, "example.config.py")
+    )
+    sys.modules["config"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules["config"])
+
+import numpy as np  # noqa: E402
+
+import constructor  # noqa: E402
+from features import FEATURES  # noqa: E402
+from mood import classify_windows  # noqa: E402
+from models import (  # noqa: E402
+    parse_recently_played,
+    parse_top_artists,
+    parse_top_tracks,
+)
+from readme import Readme  # noqa: E402
+
+LIMITS = (1, 5, 10, 20, 50)
+PLAYS = (100, 1000, 10000)  # plays in the week the mood is classified over
+MOOD_WINDOWS = (3600, 86400, 7 * 86400)
+README_SCALES = (1, 10, 100)  # static text around the sections, x the fixture
+PADDING = "<p align='center'>Static text kept as is between sections.</p>\n"
+# run in a fresh interpreter: cold import of what a refresh cycle needs, with
+# its time and the peak RSS (kB on Linux) of the process
+STARTUP = """\
+import importlib.util, resource, sys, time
+start = time.perf_counter()
+if importlib.util.find_spec("config") is None:
+    spec = importlib.util.spec_from_file_location("config", "example.config.py")
+    sys.modules["config"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules["config"])
+import constructor
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read() if name.endswith(".md") else json.load(f)
+
+
+def padded_readme(text: str, scale: int) -> str:
+    padding = PADDING * (len(text) * (scale - 1) // len(PADDING))
+    return padding[: len(padding) // 2] + text + padding[len(padding) // 2 :]
+
+
+def measure(func, repeat: int, number: int) -> dict:
+    func()  # warm up template and regex caches
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "time_us": {
+            "min": round(min(times) * 1e6, 3),
+            "median": round(statistics.median(times) * 1e6, 3),
+        },
+        "alloc": {"peak_bytes": peak - before, "retained_bytes": current - before},
+    }
+
+
+def measure_startup(repeat: int) -> dict:
+    times, rss = [], []
+    for _ in range(repeat):
+        elapsed, maxrss = subprocess.run(
+            [sys.executable, "-c", STARTUP],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        times.append(float(elapsed))
+        rss.append(int(maxrss))
+    return {
+        "time_us": {
+            "min": round(min(times) * 1e6, 3),
+            "median": round(statistics.median(times) * 1e6, 3),
+        },
+        "rss": {"max_kb": max(rss)},
+    }
+
+
+def make_profile(readme: Readme, limit: int, files_dir: str) -> SimpleNamespace:
+    # just the attributes the section builders read, no API clients
+    return SimpleNamespace(
+        name="bench",
+        readme=readme,
+        limit=limit,
+        time_frame="this month",
+        files_dir=files_dir,
+        username="username",
+        user_url="https://open.spotify.com/user/example",
+        website="https://example.com",
+        discord_url="https://discord.gg/example",
+    )
+
+
+def section_cases(payloads: dict, template: str, files_dir: str):
+    for limit in LIMITS:
+        recent = dict(payloads["recently_played"])
+        recent["items"] = recent["items"][:limit]
+        tops = dict(payloads["top_tracks"])
+        tops["items"] = tops["items"][: max(limit, 5)]
+        artists = dict(payloads["top_artists"])
+        artists["items"] = artists["items"][:limit]
+        yield "parse.recently_played", limit, lambda p=recent: parse_recently_played(p)
+        yield "parse.top_tracks", limit, lambda p=tops: parse_top_tracks(p)
+        yield "parse.top_artists", limit, lambda p=artists: parse_top_artists(p)
+
+        profile = make_profile(Readme("README.md", template), limit, files_dir)
+        tracks, songs = parse_recently_played(recent), parse_top_tracks(tops)
+        top = parse_top_artists(artists)
+        yield "section.recentlyplayed", limit, lambda p=profile, d=tracks: (
+            constructor.add_recently_played(p, d)
+        )
+        yield "section.topartists", limit, lambda p=profile, d=top: (
+            constructor.add_top_artists(p, d)
+        )
+        yield "section.topsongs", limit, lambda p=profile, d=songs: (
+            constructor.add_top_songs(p, d)
+        )
+
+    profile = make_profile(Readme("README.md", template), 5, files_dir)
+    mood = (("😊: Happy", "Happiness Level: 60%"), "Happy and Upbeat")
+    yield "section.status", None, lambda: constructor.get_user_status(
+        profile, payloads["playing"]
+    )
+    yield "section.mood", None, lambda: constructor.update_mood(profile, *mood)
+    yield "section.quote", None, lambda: constructor.update_quote(
+        profile, ("Raise your words, not voice.", "Rumi")
+    )
+    yield "section.layout", None, lambda: constructor.sync_status(profile, True)
+    yield "section.prepare_layout", None, lambda: constructor.prepare_layout(
+        profile, avatar_url="avatar.png"
+    )
+
+
+def splice_cases(payloads: dict, template: str, files_dir: str):
+    tracks = parse_recently_played(payloads["recently_played"])
+    for scale in README_SCALES:
+        text = padded_readme(template, scale)
+        path = os.path.join(files_dir, f"README.{scale}.md")
+        readme = Readme(path, text)
+        profile = make_profile(readme, 10, files_dir)
+        contents = [
+            constructor._render_recently_played(profile, tracks[:10]),
+            constructor._render_recently_played(profile, tracks[1:11]),
+        ]
+
+        def splice(readme=readme):
+            # swap a section in and serialize, as a cycle does before saving
+            contents.reverse()
+            readme.replace("recentlyplayed", contents[0])
+            return readme.text()
+
+        def save(readme=readme):
+            readme.dirty = True
+            readme.save()
+
+        yield "readme.parse", scale, lambda t=text, p=path: Readme(p, t)
+        yield "readme.splice", scale, splice
+        yield "readme.save", scale, save
+
+
+def mood_cases(features: list):
+    table = np.array([[item[f] for f in FEATURES] for item in features])
+    for plays in PLAYS:
+        matrix = table[np.arange(plays) % len(table)]
+        played_at = np.linspace(0, MOOD_WINDOWS[-1], plays)
+        yield "mood.classify_windows", plays, lambda m=matrix, p=played_at: (
+            classify_windows(m, p, MOOD_WINDOWS[-1], MOOD_WINDOWS)
+        )
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["name"], r["param"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get((result["name"], result["param"]))
+        if old is None:
+            continue
+        ratio = result["time_us"]["median"] / max(old["time_us"]["median"], 1e-9)
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline cycle benchmarks.")
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench", "results.json"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--filter", default="", help="only names containing this")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # sprites download every cover, keep the benchmark offline
+    if constructor.asset_mode == "sprite":
+        constructor.asset_mode = "small"
+    payloads = {
+        name: load_fixture(f"{name}.json")
+        for name in ("recently_played", "top_tracks", "top_artists", "playing")
+    }
+    template = load_fixture("README.md")
+
+    results = []
+    with tempfile.TemporaryDirectory() as files_dir:
+        cases = [
+            *section_cases(payloads, template, files_dir),
+            *splice_cases(payloads, template, files_dir),
+            *mood_cases(load_fixture("audio_features.json")),
+        ]
+        for name, param, func in cases:
+            if args.filter not in name:
+                continue
+            result = {"name": name, "param": param}
+            result.update(measure(func, args.repeat, args.number))
+            results.append(result)
+            print(
+                f"{name:<24} {str(param or ''):>4} "
+                f"{result['time_us']['median']:>10.1f} us "
+                f"{result['alloc']['peak_bytes']:>9} B peak"
+            )
+
+    if args.filter in "startup.import":
+        result = {"name": "startup.import", "param": None}
+        result.update(measure_startup(args.repeat))
+        results.append(result)
+        print(
+            f"{'startup.import':<24} {'':>4} "
+            f"{result['time_us']['median']:>10.1f} us "
+            f"{result['rss']['max_kb']:>9} kB rss"
+        )
+
+    regressions = []
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for result in regressions:
+            print(
+                f"Regression: {result['name']} {result['param'] or ''} is "
+                f"{result['vs_baseline']:.2f}x the baseline median"
+            )
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": args.repeat,
+            "number": args.number,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"Wrote {len(results)} results to {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
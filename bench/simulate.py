@@ -0,0 +1,210 @@
+# Runs the daemon against bench/fakeapi.py for a number of simulated minutes.
+#
+#   python bench/simulate.py --minutes 60 --speed 60 --profiles 4 --latency 80
+#
+# Every interval of the configuration (refresh, cache, commit) is divided by
+# --speed so an hour of listening takes a minute. Injected latency stays in
+# real time. Reports cycle latency percentiles, calls per endpoint and the
+# commits made, and writes them to --output as JSON.
+#
+#   python bench/simulate.py --once --profiles 4
+#
+# runs `app.py --once` instead and reports the time from `import app` to exit.
+import argparse
+import ast
+import importlib.util
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import ModuleType
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path[:0] = [ROOT, BENCH]
+
+import fakeapi  # noqa: E402
+
+SCALED = (
+    "commit_interval",
+    "max_staleness",
+    "push_revalidate",
+    "status_max_wait",
+    "status_max_backoff",
+)
+
+
+def load_config() -> ModuleType:
+    # the user's config.py if there is one, else the example
+    path = os.path.join(ROOT, "config.py")
+    if not os.path.exists(path):
+        path = os.path.join(ROOT, "example.config.py")
+    spec = importlib.util.spec_from_file_location("config", path)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return config
+
+
+def make_config(base: str, args) -> ModuleType:
+    # read the effective settings first, then scale them for the simulation
+    config = load_config()
+    sys.modules["config"] = config
+    import settings as defaults
+
+    del sys.modules["settings"]
+    speed = args.speed
+    for name in SCALED:
+        setattr(config, name, getattr(defaults, name) / speed)
+    config.refresh_intervals = {
+        job: interval / speed for job, interval in defaults.refresh_intervals.items()
+    }
+    config.cache_ttl = {
+        endpoint: ttl / speed for endpoint, ttl in defaults.cache_ttl.items()
+    }
+    config.spotify_api_url = f"{base}/v1/"
+    config.github_api_url = base
+    config.quote_url = f"{base}/api/quotes"
+    config.rate_limits = {}
+    config.metrics_port = None
+    config.metrics_path = None
+    config.asset_mode = "original"
+    for assignment in args.set:
+        name, _, value = assignment.partition("=")
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass  # a plain string
+        setattr(config, name, value)
+    config.profiles = [
+        {
+            "name": f"user{i}",
+            "username": f"user{i}",
+            "github_token": f"user{i}",
+            "github_reponame": f"user{i}/user{i}",
+        }
+        for i in range(args.profiles)
+    ]
+    return config
+
+
+def auth_scopes() -> list:
+    # read in a child process, so `import app` below starts without spotipy
+    return subprocess.run(
+        [sys.executable, "-c", "from auth import scopes; print(*scopes)"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+
+def write_tokens(profiles: list, scopes: list) -> None:
+    # a valid cached token per profile, so spotipy never asks for one
+    for options in profiles:
+        files_dir = os.path.join("files", options["name"])
+        os.makedirs(files_dir, exist_ok=True)
+        with open(os.path.join(files_dir, ".spotify-token"), "w") as f:
+            json.dump(
+                {
+                    "access_token": "fake",
+                    "refresh_token": "fake",
+                    "token_type": "Bearer",
+                    "expires_in": 3600,
+                    "expires_at": int(time.time()) + 86400,
+                    "scope": " ".join(scopes),
+                },
+                f,
+            )
+
+
+def percentile(values: list, q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate the daemon offline.")
+    parser.add_argument("--minutes", type=float, default=30, help="simulated")
+    parser.add_argument("--speed", type=float, default=30, help="simulated s per s")
+    parser.add_argument("--profiles", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=50, help="mean, in ms")
+    parser.add_argument("--jitter", type=float, default=20, help="std dev, in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=os.path.join(BENCH, "simulation.json"))
+    parser.add_argument(
+        "--set", action="append", default=[], help="NAME=VALUE config override"
+    )
+    parser.add_argument("--once", action="store_true", help="time app.py --once")
+    parser.add_argument("--workdir", help="reuse the files of an earlier run")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    faults = fakeapi.Faults(
+        args.latency / 1000, args.jitter / 1000, args.error_rate, args.rate_limit_rate
+    )
+    server = fakeapi.serve(faults=faults, speed=args.speed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="spotify-readme-sim-")
+    os.chdir(workdir)
+
+    config = make_config(server.base, args)
+    write_tokens(config.profiles, auth_scopes())
+    started = time.perf_counter()
+    import app
+
+    imported = time.perf_counter()
+    if not args.verbose:
+        logging.getLogger("").setLevel(logging.WARNING)
+
+    cycles = []
+    run_cycle = app.run_cycle
+
+    def timed_cycle(profile, jobs):
+        start = time.perf_counter()
+        try:
+            return run_cycle(profile, jobs)
+        finally:
+            cycles.append((profile.name, tuple(jobs), time.perf_counter() - start))
+
+    app.run_cycle = timed_cycle
+    if args.once:
+        app.main(["--once"])
+    else:
+        duration = args.minutes * 60 / args.speed
+        timer = threading.Timer(duration, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        app.main([])
+        timer.cancel()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    latencies = [seconds for _, _, seconds in cycles]
+    report = {
+        "config": vars(args),
+        "workdir": workdir,
+        "elapsed_s": round(elapsed, 3),
+        "import_ms": round((imported - started) * 1000, 2),
+        "cycles": len(cycles),
+        "cycle_ms": {
+            f"p{q}": round(percentile(latencies, q) * 1000, 2)
+            for q in (50, 90, 99)
+            if latencies
+        },
+        "cycle_ms_max": round(max(latencies) * 1000, 2) if latencies else None,
+        **server.stats(),
+    }
+    print(json.dumps(report, indent=2))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import api_call, cache_lookups
+from settings import cache_path, cache_size, cache_ttl
+
+_MISSING = object()
+SAVE_INTERVAL = 30  # seconds between writes of a cache file, at most
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL.
+
+    Keys are strings of the form ``endpoint:arguments`` so entries can be
+    dropped per endpoint and the whole cache can be persisted as JSON.
+    Expired entries are swept whenever one is added, and the file is
+    rewritten at most every ``SAVE_INTERVAL`` seconds, outside the lock.
+    """
+
+    def __init__(self, maxsize: int = 128, path: str | None = None) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._loaded = path is None
+        self._changed = False
+        self._saved_at = 0.0
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            self._load()
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float) -> None:
+        with self._lock:
+            self._load()
+            now = time.time()
+            expired = [k for k, (at, _) in self._data.items() if at <= now]
+            for expired_key in expired:
+                del self._data[expired_key]
+            self._data[key] = (now + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._changed = True
+        if now - self._saved_at >= SAVE_INTERVAL:
+            self.flush()
+
+    def invalidate(self, endpoint: str | None = None) -> int:
+        # drop every entry, or only the ones cached for a single endpoint
+        with self._lock:
+            self._load()
+            if endpoint is None:
+                keys = list(self._data)
+            else:
+                keys = [key for key in self._data if key.split(":", 1)[0] == endpoint]
+            for key in keys:
+                del self._data[key]
+            self._changed = self._changed or bool(keys)
+        if keys:
+            self.flush()
+        return len(keys)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable cache file {self.path}: {e}\n")
+            return
+        now = time.time()
+        for key, expires_at, value in entries[-self.maxsize :]:
+            if expires_at > now:
+                self._data[key] = (expires_at, value)
+
+    def flush(self) -> None:
+        # write the entries to the cache file if they changed since the last
+        # write; the lookup lock is only held while copying them
+        if self.path is None:
+            return
+        from helpers import write_atomic
+
+        with self._save_lock:
+            with self._lock:
+                if not self._changed:
+                    return
+                entries = [
+                    [key, expires_at, value]
+                    for key, (expires_at, value) in self._data.items()
+                ]
+                self._changed = False
+                self._saved_at = time.time()
+            try:
+                write_atomic(self.path, json.dumps(entries))
+            except (OSError, TypeError) as e:
+                logging.warning(f"Could not persist cache to {self.path}: {e}\n")
+
+
+_caches = {}  # profile name -> TTLCache
+_caches_lock = threading.Lock()
+
+
+def cache_for(profile) -> TTLCache:
+    # one cache per profile, so a busy profile cannot evict another's entries;
+    # its file sits in the profile's own files_dir
+    with _caches_lock:
+        cache = _caches.get(profile.name)
+        if cache is None:
+            path = None
+            if cache_path:
+                path = os.path.join(profile.files_dir, os.path.basename(cache_path))
+            cache = _caches[profile.name] = TTLCache(maxsize=cache_size, path=path)
+        return cache
+
+
+def cached(endpoint: str):
+    # cache a fetcher's result for cache_ttl[endpoint] seconds
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ttl = cache_ttl.get(endpoint, 0)
+            if not ttl:
+                with api_call(endpoint):
+                    return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            cache = cache_for(bound.arguments["profile"])
+            arguments = json.dumps(
+                {k: v for k, v in bound.arguments.items() if k != "profile"},
+                sort_keys=True,
+                default=repr,
+            )
+            key = f"{endpoint}:{arguments}"
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                cache_lookups.inc(endpoint=endpoint, result="miss")
+                with api_call(endpoint):
+                    value = func(*args, **kwargs)
+                cache.set(key, value, ttl)
+            else:
+                cache_lookups.inc(endpoint=endpoint, result="hit")
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(endpoint: str | None = None) -> int:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return sum(cache.invalidate(endpoint) for cache in caches)
+
+
+def flush() -> None:
+    # write every cache that changed since its last write, e.g. on shutdown
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.flush()
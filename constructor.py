@@ -1,187 +1,206 @@
+import dataclasses
+import functools
 import logging
-
-import pandas as pd
-import requests
-
-from config import limit, time_range, user_url, username
+import time
+
+from assets import SPRITES, build_sprite
+from features import feature_store
+from models import (
+    Artist,
+    Track,
+    parse_top_artists,
+    parse_top_tracks,
+)
+from fetcher import Dataset, fetch_all
+from net import session
 from helpers import (
-    classify_music_tastes,
     double_hyphen,
-    get_music_mood,
     linkify,
     playing,
-    read_write_file,
-    recently_played,
     top_artists,
     top_songs,
 )
+from sections import Section
+from settings import (
+    asset_mode,
+    mood_window,
+    quote_url,
+    thumbnail_width,
+    top_source,
+)
+from templates import Markup, Template
+
+
+def _fetch_recently_played(profile, inputs: dict) -> list[Track]:
+    # only plays newer than the stored history are requested
+    profile.history.update(profile)
+    return profile.history.recent(profile.limit)
+
+
+def _local_top_artists(profile, inputs: dict) -> list[Artist]:
+    # ranked from the history, with this cycle's plays in if they came
+    profile.charts.update()
+    artist_ids = profile.charts.top_artists(profile.limit)
+    return profile.history.artists(profile, artist_ids)
+
+
+def _local_top_songs(profile, inputs: dict) -> list[Track]:
+    profile.charts.update()
+    track_ids = profile.charts.top_tracks(max(profile.limit, 5))
+    return profile.history.tracks(track_ids)
+
 
-time_frame = {
-    "long_term": "several years",
-    "medium_term": "last 6 months",
-    "short_term": "this month",
-}.get(time_range)
+def _classify_plays(profile, plays: list, now: float, window: float):
+    from mood import classify_windows  # loads numpy, only the mood needs it
 
+    matrix = feature_store.matrix(profile.sp, [track_id for _, track_id, _ in plays])
+    played_at = [at / 1000 for at, _, _ in plays]
+    return classify_windows(matrix, played_at, now, [window])[0]
 
-def get_user_status() -> bool:
-    pendingupdate = read_write_file(file_path="files/README.md", mode="r")
-    # fetch user's status
-    data = playing()
+
+def _fetch_mood(profile, inputs: dict) -> tuple:
+    # every play of the last mood_window seconds counts, so the mood follows
+    # what was actually listened to; the top tracks stand in without plays
+    now = time.time()
+    result = None
+    if mood_window:
+        plays = profile.history.plays(int((now - mood_window) * 1000))
+        result = plays and _classify_plays(profile, plays, now, mood_window)
+    if not result and "top_songs" in inputs:
+        plays = [(now * 1000, track.id, None) for track in inputs["top_songs"]]
+        result = _classify_plays(profile, plays, now, 1)
+    if not result:
+        raise ValueError("No audio features available for the recent plays.")
+    mood, happiness, taste = result
+    return (mood, happiness), taste
+
+
+# every dataset a section may need; fetch_data fetches each one at most once
+# per cycle, together with the datasets it needs or uses
+DATASETS = {
+    "playing": Dataset(lambda profile, inputs: playing(profile)),
+    "recently_played": Dataset(_fetch_recently_played),
+    "top_artists": Dataset(
+        lambda profile, inputs: parse_top_artists(
+            top_artists(profile, limit=profile.limit, time_range=profile.time_range)
+        )
+    ),
+    "top_songs": Dataset(
+        lambda profile, inputs: parse_top_tracks(
+            top_songs(
+                profile, limit=max(profile.limit, 5), time_range=profile.time_range
+            )
+        )
+    ),
+    "mood": Dataset(_fetch_mood, uses=("top_songs",)),
+    "quote": Dataset(lambda profile, inputs: fetch_quote()),
+}
+
+
+# sections refreshed by each scheduled job, see refresh_intervals
+JOBS = {
+    "status": ("status",),
+    "recents": ("recentlyplayed",),
+    "tops": ("topartists", "topsongs", "mood"),
+    "quote": ("quote",),
+}
+
+# local top lists cost no request, so they follow every new play; a failed
+# history update still leaves the stored plays to rank
+if top_source == "local":
+    DATASETS.update(
+        top_artists=Dataset(_local_top_artists, uses=("recently_played",)),
+        top_songs=Dataset(_local_top_songs, uses=("recently_played",)),
+    )
+    JOBS["recents"] += ("topartists", "topsongs")
+
+
+def fetch_data(profile, names: list, timeout: float) -> tuple[dict, dict]:
+    datasets = {
+        name: dataclasses.replace(
+            dataset, fetch=functools.partial(dataset.fetch, profile)
+        )
+        for name, dataset in DATASETS.items()
+    }
+    return fetch_all(datasets, names, timeout=timeout)
+
+
+def get_user_status(profile, data: dict) -> bool:
     if data:
         try:
             is_playing = data["is_playing"]
             song = data["item"]["name"]
             action = "Playing" if is_playing else "Paused"
         except TypeError:
-            logging.info("Spotify returned NoneType.\n")
+            logging.warning("Spotify returned no track, assuming an advertisement.\n")
             song = "Advertisement 😞"
             action = "Playing"
     else:
         song = "Offline"
-        action = username
+        action = profile.username
 
     content = f"""<p status, align='center'>
-  <a href='{user_url}'>
+  <a href='{profile.user_url}'>
     <img src="https://img.shields.io/badge/{action}-{double_hyphen(song)}-&?style=social&logo=spotify">
   </a>
 </p status>"""
 
-    startblock = pendingupdate.index("<p status, align='center'>")
-    endblock = pendingupdate.index("</p status>")
-    newcontent = (
-        pendingupdate[:startblock]
-        + content
-        + pendingupdate[endblock + len("</p status>") :]
-    )
-
-    read_write_file(file_path="files/README.md", mode="w", data=newcontent)
+    profile.readme.replace("status", content)
     return bool(data)
 
 
-def add_recently_played() -> bool:
-    # Fetch recently played tracks data
-    recent_tracks_data = recently_played(limit=limit)["items"]
-    num_tracks = min(len(recent_tracks_data), limit)
-
-    df = pd.DataFrame(recent_tracks_data)
-    df = pd.json_normalize(df["track"])
-    df = df[["name", "external_urls.spotify", "album.images"]]
-    df.columns = ["song", "song_url", "image_url"]
-    df["image_url"] = df["image_url"].apply(lambda x: x[0]["url"])
-
-    table_html = "<table style='width:100%'>\n" + "<tr align='center'>\n"
-    for i in range(num_tracks):
-        table_html += f"<td>\n"
-        table_html += f"<img class='artists' src='{df['image_url'][i]}' alt='{df['song'][i]}' style='width:50%'>\n"
-        table_html += f"</td>\n"
-    table_html += "</tr>\n"
-    table_html += "<tr align='center'>\n"
-    for i in range(num_tracks):
-        table_html += f"<td>\n"
-        table_html += f"<a href='{df['song_url'][i]}'>{df['song'][i]}</a>\n"
-        table_html += f"</td>\n"
-    table_html += "</tr>\n"
-    table_html += "</table>\n"
-
-    # Update README.md file
-    readme = read_write_file(file_path="files/README.md", mode="r")
-    startblock = readme.index("<p recentlyplayed, float='left'>")
-    endblock = readme.index("</p recentlyplayed>")
-    new_content = f"""<p recentlyplayed, float='left'>
+# section templates, compiled once
+TABLE = Template(
+    """<table style='width:100%'>
+<tr align='center'>
+{images}</tr>
+<tr align='center'>
+{links}</tr>
+</table>
+"""
+)
+IMAGE_CELL = Template(
+    """<td>
+<img class='artists' src='{src}' alt='{name}' style='width:50%'>
+</td>
+"""
+)
+SPRITE_CELL = Template(
+    """<td colspan='{count}'>
+<img class='artists' src='{src}' alt='{alt}' style='width:100%'>
+</td>
+"""
+)
+TRACK_LINK_CELL = Template(
+    """<td>
+<a href='{url}'>{name}</a>
+</td>
+"""
+)
+ARTIST_LINK_CELL = Template(
+    """<td>
+<a href='{url}' target='_blank'>{name}</a>
+</td>
+"""
+)
+RECENTLY_PLAYED = Template(
+    """<p recentlyplayed, float='left'>
   <br>
   <h1>Recently played tracks</h1>
   <p></p>
-  {table_html}
+  {table}
 </p recentlyplayed>"""
-    new_readme = (
-        readme[:startblock]
-        + new_content
-        + readme[endblock + len("</p recentlyplayed>") :]
-    )
-
-    read_write_file(file_path="files/README.md", mode="w", data=new_readme)
-    return num_tracks == limit
-
-
-def add_top_artists() -> bool:
-    # Fetch top artists data
-    top_artists_data = top_artists(limit=limit)["items"]
-    num_artists = min(len(top_artists_data), limit)
-
-    artists = []
-    for artist_data in top_artists_data:
-        artist = {
-            "name": artist_data["name"],
-            "artist_url": artist_data["external_urls"]["spotify"],
-            "image_url": artist_data["images"][0]["url"],
-        }
-        artists.append(artist)
-
-    table_html = "<table style='width:100%'>\n" + "<tr align='center'>\n"
-
-    for i in range(num_artists):
-        table_html += f"<td>\n"
-        table_html += f"<img class='artists' src='{artists[i]['image_url']}' alt='{artists[i]['name']}' style='width:50%'>\n"
-        table_html += f"</td>\n"
-
-    table_html += "</tr>\n"
-    table_html += "<tr align='center'>\n"
-
-    for i in range(num_artists):
-        table_html += f"<td>\n"
-        table_html += f"<a href='{artists[i]['artist_url']}' target='_blank'>{artists[i]['name']}</a>\n"
-        table_html += f"</td>\n"
-
-    table_html += "</tr>\n"
-    table_html += "</table>\n"
-
-    # Update README.md file
-    readme = read_write_file(file_path="files/README.md", mode="r")
-    startblock = readme.index("<p topartists, float='left'>")
-    endblock = readme.index("</p topartists>")
-    new_content = f"""<p topartists, float='left'>
+)
+TOP_ARTISTS = Template(
+    """<p topartists, float='left'>
   <br>
   <h1>Top artists [{time_frame}]</h1>
   <p></p>
-  {table_html}
+  {table}
 </p topartists>"""
-    new_readme = (
-        readme[:startblock] + new_content + readme[endblock + len("</p topartists>") :]
-    )
-
-    read_write_file(file_path="files/README.md", mode="w", data=new_readme)
-    return num_artists == limit
-
-
-def add_top_songs() -> bool:
-    # fetch top songs
-    data_songs = top_songs(limit=max(limit, 5))["items"]
-    global song_id
-    song_id = [item["id"] for item in data_songs]
-    song_num = len(song_id)
-    song_info = []
-
-    for item in data_songs:
-        album = item["album"]
-        album_url = album["external_urls"]["spotify"]
-        artist = item["artists"][0]
-        artist_url = artist["external_urls"]["spotify"]
-        song_url = item["external_urls"]["spotify"]
-        song = item["name"]
-        image_url = album["images"][0]["url"]
-        song_info.append(
-            (
-                song,
-                song_url,
-                album["name"],
-                album_url,
-                artist["name"],
-                artist_url,
-                image_url,
-            )
-        )
-
-    content = f"""<p topsongs, float='left' >
+)
+TOP_SONGS = Template(
+    """<p topsongs, float='left' >
   <br>
   <h1>Top tracks [{time_frame}]</h1>
   <p></p>
@@ -199,15 +218,15 @@ def add_top_songs() -> bool:
       <td>
       <h2>Artist</h2>
       </td>
-    </tr>"""
-
-    for i in range(song_num):
-        song, song_url, album, album_url, artist, artist_url, image_url = song_info[i]
-        content += f"""<tr align='center'>
-      <td><img class='artists' src='{image_url}' alt='{song}' style='width:10%'>
+    </tr>{rows}</table>
+</p topsongs>"""
+)
+TOP_SONG_ROW = Template(
+    """<tr align='center'>
+      <td><img class='artists' src='{src}' alt='{name}' style='width:10%'>
       </td>
       <td>
-      <a href='{song_url}'>{song}</a>
+      <a href='{url}'>{name}</a>
       </td>
       <td>
       <a href='{album_url}'>{album}</a>
@@ -216,53 +235,96 @@ def add_top_songs() -> bool:
       <a href='{artist_url}'>{artist}</a>
       </td>
     </tr>"""
+)
 
-    content += """</table>
-</p topsongs>"""
 
-    data = read_write_file(file_path="files/README.md", mode="r")
-    startblock = data.index("<p topsongs, float='left' >")
-    endblock = data.index("</p topsongs>")
-    newcontent = data[:startblock] + content + data[endblock + len("</p topsongs>") :]
+def _image_src(record) -> str:
+    if asset_mode == "original":
+        return record.image_url
+    return record.thumbnail(thumbnail_width)
 
-    read_write_file(file_path="files/README.md", mode="w", data=newcontent)
-    return song_num == 5
 
+def _render_images(profile, section: str, records: list) -> Markup:
+    if asset_mode == "sprite" and section in SPRITES and records:
+        try:
+            urls = [_image_src(record) for record in records]
+            src = build_sprite(profile.files_dir, section, urls)
+            alt = ", ".join(record.name for record in records)
+            return SPRITE_CELL.render(count=len(records), src=src, alt=alt)
+        except Exception as e:
+            logging.warning(f"Could not build the {section} sprite: {e}\n")
+    return Markup(
+        "".join(IMAGE_CELL.render(record, src=_image_src(record)) for record in records)
+    )
 
-def update_mood():
-    # classify music features
-    music_classification = get_music_mood(song_id)
-    mood, happiness = music_classification[0], music_classification[1]
 
-    data = read_write_file(file_path="files/README.md", mode="r")
-    clas_start = data.index("<td>Music Mood is")
-    clas_end = data.index("Music</td>")
-    clas_content = f"<td>Music Mood is {mood} | {happiness} | Current Taste: {classify_music_tastes(song_id)} Music</td>"
-    # print(clas_content)
-    new_clas_content = (
-        data[:clas_start] + clas_content + data[clas_end + len("Music</td>") :]
+def _render_recently_played(profile, tracks: list[Track]) -> str:
+    table = TABLE.render(
+        images=_render_images(profile, "recentlyplayed", tracks),
+        links=TRACK_LINK_CELL.render_each(tracks),
     )
+    return RECENTLY_PLAYED.render(table=table)
 
-    read_write_file(file_path="files/README.md", mode="w", data=new_clas_content)
+
+def _render_top_artists(profile, artists: list[Artist]) -> str:
+    table = TABLE.render(
+        images=_render_images(profile, "topartists", artists),
+        links=ARTIST_LINK_CELL.render_each(artists),
+    )
+    return TOP_ARTISTS.render(time_frame=profile.time_frame, table=table)
+
+
+def _render_top_songs(profile, tracks: list[Track]) -> str:
+    rows = Markup(
+        "".join(TOP_SONG_ROW.render(track, src=_image_src(track)) for track in tracks)
+    )
+    return TOP_SONGS.render(time_frame=profile.time_frame, rows=rows)
 
 
-def sync_status(condi: bool):
-    readme = read_write_file(file_path="files/README.md", mode="r")
+def add_recently_played(profile, tracks: list[Track]) -> bool:
+    tracks = tracks[: profile.limit]
+    content = _render_recently_played(profile, tracks)
+    profile.readme.replace("recentlyplayed", content)
+    return len(tracks) == profile.limit
+
+
+def add_top_artists(profile, artists: list[Artist]) -> bool:
+    artists = artists[: profile.limit]
+    profile.readme.replace("topartists", _render_top_artists(profile, artists))
+    return len(artists) == profile.limit
+
+
+def add_top_songs(profile, tracks: list[Track]) -> bool:
+    profile.readme.replace("topsongs", _render_top_songs(profile, tracks))
+    return len(tracks) == 5
+
+
+def update_mood(profile, music_classification: tuple, taste: str):
+    mood, happiness = music_classification[0], music_classification[1]
+
+    clas_content = f"<td>Music Mood is {mood} | {happiness} | Current Taste: {taste} Music</td>"
+    profile.readme.replace("mood", clas_content)
+
+
+DEFAULT_QUOTE = """<h4 align='center'>Raise your words, not voice. It is rain that grows flowers, not thunder. - <a href='https://duckduckgo.com/?q=Rumi' target='_blank'>Rumi</a>.</h4>"""
+DEFAULT_LAYOUT = """<img src='https://img.shields.io/badge/Layout-Synced-brightgreen' class='layout'>"""
+
+
+def sync_status(profile, condi: bool):
     if condi:
         content = """<img src='https://img.shields.io/badge/Layout-Synced-brightgreen' class='layout'>"""
     else:
         content = """<img src='https://img.shields.io/badge/Layout-Unsynced-red' class='layout'>"""
 
-    startblock = readme.index("<img src='https://img.shields.io/badge/Layout-")
-    endblock = readme.index("class='layout'>")
-    newcontent = (
-        readme[:startblock] + content + readme[endblock + len("class='layout'>") :]
-    )
-    read_write_file(file_path="files/README.md", mode="w", data=newcontent)
+    profile.readme.replace("layout", content)
 
 
-def prepare_layout(website: str, discord_url: str, avatar_url: str) -> None:
-    readme = read_write_file(file_path="files/README.md", mode="r")
+def prepare_layout(profile, avatar_url: str) -> None:
+    username, website = profile.username, profile.website
+    # the quote and sync badge of a previous run are kept, not reset
+    readme = profile.readme
+    quote = readme.get("quote") if "quote" in readme.index else DEFAULT_QUOTE
+    layout = readme.get("layout") if "layout" in readme.index else DEFAULT_LAYOUT
     content = f"""<h1 align='center'>
   <br>
   <a href='https://www.youtube.com/watch?v=dQw4w9WgXcQ'><img src='{avatar_url}' alt='{username}' width='200'></a>
@@ -271,45 +333,52 @@ def prepare_layout(website: str, discord_url: str, avatar_url: str) -> None:
   <br>
 </h1>
 
-<h4 align='center'>Raise your words, not voice. It is rain that grows flowers, not thunder. - <a href='https://duckduckgo.com/?q=Rumi' target='_blank'>Rumi</a>.</h4>
+{quote}
 
 <p align='center' socials>
-  <a href='{discord_url}'>
+  <a href='{profile.discord_url}'>
     <img src='https://img.shields.io/badge/Discord-server-blue'>
   </a>
   <a href='{website}'>
     <img src='https://img.shields.io/website?down_color=red&down_message=offline&label=Website&up_color=light%20green&up_message=online&url={website}'>
   </a>
-  <img src='https://img.shields.io/badge/Layout-Synced-brightgreen' class='layout'>
+  {layout}
 </p socials>"""
-    startblock = readme.index("<h1 align='center'>")
-    endblock = readme.index("</p socials>")
-    newcontent = (
-        readme[:startblock] + content + readme[endblock + len("</p socials>") :]
-    )
-    read_write_file(file_path="files/README.md", mode="w", data=newcontent)
-
-
-def update_quote():
-    try:
-        url = "https://zenquotes.io/api/quotes"
-        response = requests.get(url)
-        data = response.json()
-        quote = data[0]["q"]
-        author = data[0]["a"]
-    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
-        quote = "Error while fetching quote."
-        author = f"{e}"
-
-    content = read_write_file(file_path="files/README.md", mode="r")
-    startblock = content.index("<h4 align='center'>")
-    endblock = content.index("</a>.</h4>")
-    new_content = f"<h4 align='center'>{quote} - <a href='{linkify(author)}' target='_blank'>{author}</a>.</h4>"
+    readme.replace_block("<h1 align='center'>", "</p socials>", content)
 
-    new_content = (
-        content[:startblock] + new_content + content[endblock + len("</a>.</h4>") :]
-    )
-    read_write_file("files/README.md", "w", data=new_content)
+
+def fetch_quote() -> tuple:
+    data = session.get(quote_url).json()
+    return data[0]["q"], data[0]["a"]
+
+
+def update_quote(profile, data: tuple):
+    quote, author = data
+    new_content = f"<h4 align='center'>{quote} - <a href='{linkify(author)}' target='_blank'>{author}</a>.</h4>"
+    profile.readme.replace("quote", new_content)
+
+
+def _status_key(data: dict | None) -> tuple | None:
+    # progress_ms and timestamps change every poll, the badge does not
+    if not data:
+        return None
+    return data.get("is_playing"), (data.get("item") or {}).get("name")
+
+
+def make_sections() -> list[Section]:
+    # every README section kept up to date by app.run_cycle, in render order,
+    # with the datasets it is rendered from; sections sharing a dataset cost
+    # no extra request
+    return [
+        Section("status", ("playing",), get_user_status, key=_status_key),
+        Section(
+            "recentlyplayed", ("recently_played",), add_recently_played, layout=True
+        ),
+        Section("topartists", ("top_artists",), add_top_artists, layout=True),
+        Section("topsongs", ("top_songs",), add_top_songs, layout=True),
+        Section("mood", ("mood",), lambda profile, data: update_mood(profile, *data)),
+        Section("quote", ("quote",), update_quote),
+    ]
 
 
 if __name__ == "__main__":
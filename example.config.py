@@ -11,3 +11,87 @@ github_reponame = (
 discord_url = "your-discord-server-url"
 website = "your-website"
 time_range = "short_term"  # Options: long_term (several years), medium_term (last 6 months), short_term (last 4 weeks)
+
+# Optional settings, the values below are the defaults.
+# seconds to reuse a Spotify response per endpoint, 0 disables caching it.
+cache_ttl = {
+    "playing": 0,  # the status poll already adapts to playback.
+    "recently_played": 60,
+    "top_artists": 3600,
+    "top_songs": 3600,
+}
+cache_size = 128  # maximum number of cached responses per profile.
+# Each profile keeps its cache in a file of this name in its own folder; set
+# to None to keep the caches in memory only.
+cache_path = "files/cache.json"
+fetch_workers = 5  # Spotify requests made at the same time each cycle.
+# seconds to wait for a cycle's Spotify requests; requests still running
+# then, with their retries, give up instead of holding a fetch worker.
+fetch_timeout = 8
+features_path = "files/features.db"  # stored audio features of seen tracks.
+push_revalidate = 3600  # seconds before checking the remote README.md again.
+# Changes are committed once nothing new changed for commit_interval seconds,
+# which batches bursts and keeps commits at least that far apart, but never
+# later than max_staleness seconds after the first of them (at least
+# commit_interval).
+commit_interval = 15
+max_staleness = 60
+# seconds between refreshes of each part of the README, "push" only commits.
+refresh_intervals = {
+    "status": 10,
+    "recents": 60,
+    "tops": 3600,
+    "quote": 86400,
+    "push": 10,
+}
+refresh_jitter = 0.1  # up to this fraction of an interval is added at random.
+# longest wait for the end of the playing track. A skip or seek mid-track shows
+# up to this many seconds late, unless reported through the trigger below;
+# set it to refresh_intervals["status"] to see them as soon as before.
+status_max_wait = 30
+status_max_backoff = 300  # longest wait between status polls while offline.
+# how covers are embedded: "original" (largest Spotify image), "small" (smallest
+# image at least thumbnail_width wide) or "sprite" (one strip image per table,
+# committed next to the README).
+asset_mode = "original"
+thumbnail_width = 160
+# Serve several accounts from one process. Each entry needs a "name" and may
+# override any setting above (username, user_url, client_id, client_secret,
+# redirect_uri, limit, github_token, github_reponame, discord_url, website,
+# time_range); files go to files/<name>/. Leave empty for a single profile.
+profiles = []
+profile_workers = 4  # profiles updated at the same time.
+http_timeout = (3.05, 10)  # connect and read timeout of every request, seconds.
+http_retries = 3  # retries on 5xx, 429 and rate limited 403 responses.
+http_pool_size = 10  # kept-alive connections per host.
+# (requests per second, burst) allowed per host, other hosts are not limited;
+# every GitHub call takes a token, commits included (PyGithub retries do not).
+rate_limits = {
+    "api.spotify.com": (10, 20),
+    "api.github.com": (5, 10),
+    "zenquotes.io": (1, 2),
+}
+# Prometheus metrics: served on http://127.0.0.1:<metrics_port>/metrics and/or
+# written to metrics_path after every cycle (textfile collector). None disables.
+metrics_port = None
+metrics_path = None
+# API endpoints, only changed to run against bench/fakeapi.py.
+spotify_api_url = "https://api.spotify.com/v1/"
+github_api_url = "https://api.github.com"
+quote_url = "https://zenquotes.io/api/quotes"
+# Where the top sections come from: "api" (Spotify's top items for time_range)
+# or "local" (plays in the stored history, weighted to the last top_window
+# seconds, updated with every recents refresh).
+top_source = "api"
+top_window = 28 * 86400  # default window, a query may rank over another one.
+top_capacity = 1000  # tracks and artists ranked at most.
+mood_window = 7 * 86400  # seconds of plays the mood line is classified from.
+avatar_refresh = 86400  # seconds before the GitHub avatar is checked again.
+# Local trigger: POST /refresh?section=status[&profile=<name>] on
+# http://127.0.0.1:<trigger_port> or the unix socket trigger_socket runs the
+# jobs behind those sections within trigger_debounce seconds and commits the
+# result right away, e.g. from a player hook; the status refresh interval can
+# then be raised. None disables.
+trigger_port = None
+trigger_socket = None
+trigger_debounce = 1.0  # requests within this many seconds share one refresh.
@@ -0,0 +1,101 @@
+import logging
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+
+from helpers import get_audio_features
+from settings import features_path
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FEATURES = ("danceability", "energy", "loudness", "speechiness", "valence")
+BATCH_SIZE = 100  # most ids the audio-features endpoint accepts per request
+
+
+class FeatureStore:
+    """Persistent audio features keyed by track id.
+
+    A track's features never change, so each id is requested from Spotify
+    once; later lookups are served from SQLite. Tracks Spotify has no
+    features for are stored as NULL rows so they are not asked for again.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS features "
+                f"(id TEXT PRIMARY KEY, {', '.join(f'{f} REAL' for f in FEATURES)})"
+            )
+        return self._conn
+
+    def _select(self, track_ids: list) -> dict:
+        conn = self._connect()
+        known = {}
+        for i in range(0, len(track_ids), 500):
+            batch = track_ids[i : i + 500]
+            rows = conn.execute(
+                f"SELECT id, {', '.join(FEATURES)} FROM features "
+                f"WHERE id IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for row in rows:
+                features = None if row[1] is None else dict(zip(FEATURES, row[1:]))
+                known[row[0]] = features
+        return known
+
+    def _fetch(self, sp, track_ids: list) -> dict:
+        fetched = {}
+        for i in range(0, len(track_ids), BATCH_SIZE):
+            batch = track_ids[i : i + BATCH_SIZE]
+            for track_id, item in zip(batch, get_audio_features(sp, batch) or []):
+                fetched[track_id] = (
+                    None if item is None else {f: item[f] for f in FEATURES}
+                )
+        return fetched
+
+    def _lookup(self, sp, track_ids: list) -> dict:
+        with self._lock:
+            known = self._select(list(dict.fromkeys(track_ids)))
+            missing = [i for i in dict.fromkeys(track_ids) if i not in known]
+            if missing:
+                try:
+                    fetched = self._fetch(sp, missing)
+                except Exception as e:
+                    # the endpoint is deprecated; keep serving what is stored
+                    logging.warning(f"Could not fetch audio features: {e}\n")
+                    fetched = {}
+                self._connect().executemany(
+                    f"INSERT OR REPLACE INTO features VALUES "
+                    f"({', '.join('?' * (len(FEATURES) + 1))})",
+                    [
+                        (track_id, *(None,) * len(FEATURES))
+                        if item is None
+                        else (track_id, *(item[f] for f in FEATURES))
+                        for track_id, item in fetched.items()
+                    ],
+                )
+                self._conn.commit()
+                known.update(fetched)
+        return known
+
+    def matrix(self, sp, track_ids: list) -> "np.ndarray":
+        # one row of FEATURES per id, repeats included; NaN for unknown tracks
+        import numpy as np
+
+        known = self._lookup(sp, track_ids)
+        unique = {i: row for row, i in enumerate(dict.fromkeys(track_ids))}
+        table = np.full((len(unique), len(FEATURES)), np.nan)
+        for track_id, row in unique.items():
+            if known.get(track_id) is not None:
+                table[row] = [known[track_id][f] for f in FEATURES]
+        return table[[unique[track_id] for track_id in track_ids]]
+
+
+feature_store = FeatureStore(features_path)
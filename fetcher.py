@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from net import deadline
+from settings import fetch_workers
+
+_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """One fetched dataset and the datasets it is computed from.
+
+    ``fetch(inputs)`` gets the results of ``needs`` and ``uses`` by name. If
+    one of ``needs`` fails, the dataset fails too without being fetched; a
+    failed ``uses`` is only left out of ``inputs``.
+    """
+
+    fetch: Callable
+    needs: tuple = ()
+    uses: tuple = ()
+
+
+class DependencyError(Exception):
+    pass
+
+
+def plan(datasets: dict, names: list) -> list:
+    # the given datasets and everything they depend on, each once, with
+    # dependencies before the datasets that need them
+    order, visiting = [], set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Dataset '{name}' is part of a dependency cycle.")
+        visiting.add(name)
+        for dependency in datasets[name].needs + datasets[name].uses:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def _run(dataset: Dataset, futures: dict, until: float):
+    inputs = {}
+    for name in dataset.needs + dataset.uses:
+        try:
+            inputs[name] = futures[name].result()
+        except Exception as e:
+            if name in dataset.needs:
+                raise DependencyError(f"{name} failed: {e}") from e
+    # requests still running when the cycle stops waiting give up with it
+    with deadline(until):
+        return dataset.fetch(inputs)
+
+
+def fetch_all(datasets: dict, names: list, timeout: float) -> tuple[dict, dict]:
+    # fetch the given datasets and their dependencies once each on the shared
+    # pool, so the cycle takes about as long as its slowest chain of requests
+    # instead of their sum. A dataset waits for its dependencies on the pool;
+    # they are submitted before it and the pool is FIFO, so that never
+    # deadlocks.
+    until = time.monotonic() + timeout
+    futures = {}
+    for name in plan(datasets, names):
+        futures[name] = _pool.submit(_run, datasets[name], futures, until)
+
+    data, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            data[name] = future.result(timeout=max(0, until - time.monotonic()))
+        except TimeoutError:
+            errors[name] = TimeoutError(f"{name} did not answer within {timeout}s")
+        except Exception as e:
+            errors[name] = e
+    return data, errors
@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+from dataclasses import astuple
+from datetime import datetime
+
+from helpers import get_artists, recently_played
+from models import Artist, Track, parse_artist, parse_track
+
+PAGE_SIZE = 50  # most plays the recently-played endpoint returns at once
+ARTISTS_BATCH = 50  # most ids the artists endpoint accepts per request
+
+
+def played_at_ms(played_at: str) -> int:
+    # "2024-03-01T12:00:00.123Z" -> unix milliseconds
+    moment = datetime.fromisoformat(played_at.replace("Z", "+00:00"))
+    return int(moment.timestamp() * 1000)
+
+
+class HistoryStore:
+    """Append-only listening history of one profile, kept in SQLite.
+
+    Only plays newer than the last stored one are requested, with the
+    endpoint's ``after`` cursor, and a play is stored once however often it
+    is seen. Track metadata is stored once per track, so the recently
+    played section can be rendered from here instead of the response.
+    Artists are only requested the first time they are looked up.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS plays (
+                    played_at INTEGER PRIMARY KEY,
+                    track_id TEXT NOT NULL,
+                    artist_id TEXT
+                );
+                CREATE INDEX IF NOT EXISTS plays_track ON plays (track_id);
+                CREATE INDEX IF NOT EXISTS plays_artist ON plays (artist_id);
+                CREATE TABLE IF NOT EXISTS tracks (id TEXT PRIMARY KEY, data TEXT);
+                CREATE TABLE IF NOT EXISTS artists (id TEXT PRIMARY KEY, data TEXT);
+                """
+            )
+        return self._conn
+
+    def cursor(self) -> int | None:
+        row = self._connect().execute("SELECT MAX(played_at) FROM plays").fetchone()
+        return row[0]
+
+    def add(self, items: list) -> int:
+        # items of a recently-played response; returns the number of new plays
+        conn = self._connect()
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO plays VALUES (?, ?, ?)",
+            [
+                (
+                    played_at_ms(item["played_at"]),
+                    item["track"]["id"],
+                    (item["track"]["artists"] or [{}])[0].get("id"),
+                )
+                for item in items
+            ],
+        )
+        added = conn.total_changes - before
+        conn.executemany(
+            "INSERT OR REPLACE INTO tracks VALUES (?, ?)",
+            [
+                (track.id, json.dumps(astuple(track)))
+                for track in {
+                    track.id: track
+                    for track in (parse_track(item["track"]) for item in items)
+                }.values()
+            ],
+        )
+        conn.commit()
+        return added
+
+    def update(self, profile) -> int:
+        # pull the plays since the newest stored one, page by page
+        with self._lock:
+            added = 0
+            while True:
+                after = self.cursor()
+                payload = recently_played(profile, limit=PAGE_SIZE, after=after)
+                items = payload.get("items") or []
+                new = self.add(items)
+                added += new
+                if after is None or len(items) < PAGE_SIZE or not new:
+                    return added
+
+    def recent(self, limit: int) -> list[Track]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT tracks.data FROM plays "
+                "JOIN tracks ON tracks.id = plays.track_id "
+                "ORDER BY played_at DESC LIMIT ?",
+                (limit,),
+            )
+            return [_track(data) for (data,) in rows]
+
+    def _select(self, table: str, ids: list) -> dict:
+        rows = self._connect().execute(
+            f"SELECT id, data FROM {table} WHERE id IN ({', '.join('?' * len(ids))})",
+            ids,
+        )
+        return dict(rows.fetchall())
+
+    def tracks(self, track_ids: list) -> list[Track]:
+        # stored tracks for the given ids, in order
+        with self._lock:
+            known = self._select("tracks", track_ids)
+        return [_track(known[i]) for i in track_ids if i in known]
+
+    def artists(self, profile, artist_ids: list) -> list[Artist]:
+        # the history only has artist ids; their images are fetched once
+        with self._lock:
+            known = self._select("artists", artist_ids)
+            missing = [i for i in artist_ids if i not in known]
+            for i in range(0, len(missing), ARTISTS_BATCH):
+                batch = missing[i : i + ARTISTS_BATCH]
+                fetched = {
+                    item["id"]: json.dumps(astuple(parse_artist(item)))
+                    for item in get_artists(profile.sp, batch)
+                    if item is not None
+                }
+                self._connect().executemany(
+                    "INSERT OR REPLACE INTO artists VALUES (?, ?)", fetched.items()
+                )
+                self._conn.commit()
+                known.update(fetched)
+        return [_artist(known[i]) for i in artist_ids if i in known]
+
+    def plays(self, since: int = 0) -> list[tuple]:
+        # (played_at, track_id, artist_id) of the plays after `since`, in order
+        with self._lock:
+            return self._connect().execute(
+                "SELECT played_at, track_id, artist_id FROM plays "
+                "WHERE played_at > ? ORDER BY played_at",
+                (since,),
+            ).fetchall()
+
+
+def _track(data: str) -> Track:
+    fields = json.loads(data)
+    fields[-1] = tuple(tuple(image) for image in fields[-1])
+    return Track(*fields)
+
+
+def _artist(data: str) -> Artist:
+    fields = json.loads(data)
+    fields[-1] = tuple(tuple(image) for image in fields[-1])
+    return Artist(*fields)
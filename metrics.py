@@ -0,0 +1,225 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from settings import metrics_path, metrics_port
+
+PREFIX = "spotify_readme"
+# seconds; covers a cache hit up to a fetch that ran into fetch_timeout
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()) -> None:
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labelnames = labels
+        self.values = {}  # label values -> value
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [
+                (self.name + _labels(self.labelnames, key), value)
+                for key, value in self.values.items()
+            ]
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name} {value}" for name, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self.values.get(key, ([0] * (len(BUCKETS) + 1), 0.0))
+            counts[bisect.bisect_left(BUCKETS, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        with self._lock:
+            values = [
+                (key, list(counts), total)
+                for key, (counts, total) in self.values.items()
+            ]
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*BUCKETS, "+Inf"), counts):
+                cumulative += count
+                labels = _labels(self.labelnames, key, f'le="{bound}"')
+                samples.append((f"{self.name}_bucket{labels}", cumulative))
+            labels = _labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum{labels}", total))
+            samples.append((f"{self.name}_count{labels}", cumulative))
+        return samples
+
+
+registry = []
+
+phase_seconds = Histogram(
+    "phase_seconds",
+    "Time spent in each phase of a refresh cycle.",
+    ("profile", "phase"),
+)
+http_requests = Counter(
+    "http_requests_total",
+    "Outbound HTTP requests by host and response status.",
+    ("host", "status"),
+)
+http_seconds = Histogram(
+    "http_request_seconds",
+    "Latency of outbound HTTP requests, retries included.",
+    ("host",),
+)
+api_seconds = Histogram(
+    "api_call_seconds",
+    "Latency of Spotify and GitHub API calls that missed the cache.",
+    ("endpoint",),
+)
+api_calls = Counter(
+    "api_calls_total",
+    "Spotify and GitHub API calls by endpoint and result (ok or error).",
+    ("endpoint", "result"),
+)
+cache_lookups = Counter(
+    "cache_lookups_total",
+    "Response cache lookups by endpoint and result (hit or miss).",
+    ("endpoint", "result"),
+)
+fetch_errors = Counter(
+    "fetch_errors_total",
+    "Datasets that could not be fetched in a cycle.",
+    ("profile", "dataset"),
+)
+render_errors = Counter(
+    "render_errors_total",
+    "Sections that failed to render.",
+    ("profile", "section"),
+)
+pushes = Counter(
+    "pushes_total",
+    "README updates by result (pushed, unchanged, deferred or failed).",
+    ("profile", "result"),
+)
+last_sync = Gauge(
+    "last_sync_timestamp_seconds",
+    "Unix time the remote README was last known to be up to date.",
+    ("profile",),
+)
+
+
+@contextmanager
+def api_call(endpoint: str):
+    # count and time one API call, whichever client makes it; PyGithub does
+    # not go through the shared session, so this is all that sees its calls
+    result = "error"
+    try:
+        with api_seconds.time(endpoint=endpoint):
+            yield
+        result = "ok"
+    finally:
+        api_calls.inc(endpoint=endpoint, result=result)
+
+
+def expose() -> str:
+    return "\n".join(metric.expose() for metric in registry) + "\n"
+
+
+_write_lock = threading.Lock()  # profile workers share the tmp file
+
+
+def write_textfile(path: str = metrics_path) -> None:
+    # for the node exporter textfile collector, never leave a partial file
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    try:
+        with _write_lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(expose())
+            os.replace(tmp, path)
+    except OSError as e:
+        logging.warning(f"Could not write metrics to {path}: {e}\n")
+
+
+def serve(port: int | None = metrics_port, host: str = "127.0.0.1"):
+    # expose /metrics on a local port from a daemon thread
+    if not port:
+        return None
+    # http.server is only imported when metrics are actually served
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = expose().encode("utf-8")
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics\n")
+    return server
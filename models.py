@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+
+
+class _Images:
+    # images is ((width, url), ...) largest first, as Spotify lists them
+    __slots__ = ()
+
+    @property
+    def image_url(self) -> str:
+        return self.images[0][1] if self.images else ""
+
+    def thumbnail(self, width: int) -> str:
+        # smallest variant at least `width` pixels wide
+        for image_width, url in reversed(self.images):
+            if image_width >= width:
+                return url
+        return self.image_url
+
+
+@dataclass(frozen=True, slots=True)
+class Track(_Images):
+    id: str
+    name: str
+    url: str
+    album: str
+    album_url: str
+    artist: str
+    artist_url: str
+    images: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Artist(_Images):
+    id: str
+    name: str
+    url: str
+    images: tuple
+
+
+def _images(images: list) -> tuple:
+    return tuple(
+        sorted(
+            ((image.get("width") or 0, image["url"]) for image in images),
+            reverse=True,
+        )
+    )
+
+
+def parse_track(item: dict) -> Track:
+    album = item["album"]
+    artist = item["artists"][0]
+    return Track(
+        id=item["id"],
+        name=item["name"],
+        url=item["external_urls"]["spotify"],
+        album=album["name"],
+        album_url=album["external_urls"]["spotify"],
+        artist=artist["name"],
+        artist_url=artist["external_urls"]["spotify"],
+        images=_images(album["images"]),
+    )
+
+
+def parse_artist(item: dict) -> Artist:
+    return Artist(
+        id=item["id"],
+        name=item["name"],
+        url=item["external_urls"]["spotify"],
+        images=_images(item["images"]),
+    )
+
+
+def parse_recently_played(payload: dict) -> list[Track]:
+    return [parse_track(item["track"]) for item in payload["items"]]
+
+
+def parse_top_tracks(payload: dict) -> list[Track]:
+    return [parse_track(item) for item in payload["items"]]
+
+
+def parse_top_artists(payload: dict) -> list[Artist]:
+    return [parse_artist(item) for item in payload["items"]]
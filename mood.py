@@ -0,0 +1,70 @@
+import numpy as np
+
+from features import FEATURES
+
+DANCEABILITY, ENERGY, LOUDNESS, SPEECHINESS, VALENCE = (
+    FEATURES.index(name)
+    for name in ("danceability", "energy", "loudness", "speechiness", "valence")
+)
+
+# mood by average valence, saddest first
+MOOD_STEPS = np.array([0.2, 0.4, 0.6, 0.8])
+MOODS = ("😭: Very Sad!", "😔: Sad", "😐: Neutral", "😊: Happy", "😃: Very Happy!")
+UNKNOWN_TASTE = "Difficult to classify"
+
+
+def window_means(
+    matrix: np.ndarray, played_at, now: float, windows: list
+) -> tuple[np.ndarray, np.ndarray]:
+    # mean features of the plays within each window, in one matrix product;
+    # plays of tracks without features (NaN rows) are left out
+    played_at = np.asarray(played_at, dtype=float)
+    known = ~np.isnan(matrix).any(axis=1)
+    spans = np.asarray(windows, dtype=float)[:, None]
+    masks = ((played_at[None, :] > now - spans) & known[None, :]).astype(float)
+    counts = masks.sum(axis=1)
+    sums = masks @ np.nan_to_num(matrix)
+    return sums / np.maximum(counts, 1)[:, None], counts
+
+
+def classify(means: np.ndarray) -> list[tuple]:
+    # (mood, happiness, taste) for every row of mean features, with the
+    # same thresholds the one-off classifier used
+    dance, energy = means[:, DANCEABILITY], means[:, ENERGY]
+    loud, speech = means[:, LOUDNESS], means[:, SPEECHINESS]
+    valence = means[:, VALENCE]
+    tastes = np.select(
+        [
+            (energy > 0.5) & (speech > 0.1),
+            (energy > 0.5) & (dance > 0.5),
+            (valence > 0.5) & (dance > 0.5),
+            valence > 0.5,
+            loud < -10,
+            (dance < 0.3) & (valence < 0.3),
+        ],
+        [
+            "Energetic and Vocal",
+            "Energetic and Danceable",
+            "Happy and Danceable",
+            "Happy and Upbeat",
+            "Calm and Quiet",
+            "Sad and Slow",
+        ],
+        default=UNKNOWN_TASTE,
+    )
+    moods = np.digitize(valence, MOOD_STEPS, right=False)
+    return [
+        (MOODS[mood], f"Happiness Level: {happiness:.0%}", str(taste))
+        for mood, happiness, taste in zip(moods, valence, tastes)
+    ]
+
+
+def classify_windows(
+    matrix: np.ndarray, played_at, now: float, windows: list
+) -> list[tuple | None]:
+    # one classification per window, None for windows without known plays
+    means, counts = window_means(matrix, played_at, now, windows)
+    return [
+        result if count else None
+        for result, count in zip(classify(means), counts)
+    ]
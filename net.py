@@ -0,0 +1,145 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import http_requests, http_seconds
+from settings import http_pool_size, http_retries, http_timeout, rate_limits
+
+MAX_RETRY_AFTER = 60  # never sleep longer than this on a Retry-After header
+
+_deadline = threading.local()
+
+
+@contextmanager
+def deadline(at: float):
+    # requests made by this thread inside give up at `at` (time.monotonic()),
+    # retries and backoff included, so a fetch the cycle stopped waiting for
+    # does not keep running on the shared pool
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = at
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+def _remaining() -> float:
+    at = getattr(_deadline, "at", None)
+    return float("inf") if at is None else at - time.monotonic()
+
+
+def _cap(timeout, limit: float):
+    if isinstance(timeout, tuple):
+        return tuple(min(part, limit) for part in timeout)
+    return limit if timeout is None else min(timeout, limit)
+
+
+class RateLimitRetry(Retry):
+    # GitHub answers secondary rate limits with a 403 and a Retry-After
+    RETRY_AFTER_STATUS_CODES = frozenset({403, 413, 429, 503})
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER, max(_remaining(), 0))
+
+    def get_backoff_time(self) -> float:
+        return min(super().get_backoff_time(), max(_remaining(), 0))
+
+    def increment(self, *args, **kwargs):
+        # past the deadline, the next attempt counts as the last one
+        retry = self if _remaining() > 0 else self.new(total=0)
+        return super(RateLimitRetry, retry).increment(*args, **kwargs)
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Session(requests.Session):
+    """requests.Session with default timeouts and a token bucket per host."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.buckets = {
+            host: TokenBucket(rate, burst)
+            for host, (rate, burst) in rate_limits.items()
+        }
+
+    def throttle(self, url: str) -> None:
+        # wait for a token of the host's bucket; also taken for the requests
+        # PyGithub makes over its own connection
+        bucket = self.buckets.get(urlsplit(url).hostname)
+        if bucket is not None:
+            bucket.take()
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(url).hostname
+        self.throttle(url)
+        timeout = kwargs.get("timeout") or http_timeout
+        remaining = _remaining()
+        if remaining <= 0:
+            raise requests.Timeout(f"Gave up on {host}, the deadline passed.")
+        kwargs["timeout"] = _cap(timeout, remaining)
+        status = "error"
+        try:
+            with http_seconds.time(host=host):
+                response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            http_requests.inc(host=host, status=status)
+
+
+def make_retry() -> Retry:
+    # exponential backoff on 5xx, and on 429/403 for as long as Retry-After says
+    return RateLimitRetry(
+        total=http_retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def make_session() -> Session:
+    session = Session()
+    adapter = HTTPAdapter(
+        pool_connections=len(rate_limits) + 1,
+        pool_maxsize=http_pool_size,
+        max_retries=make_retry(),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# keep-alive connection pools shared by every outbound call
+session = make_session()
@@ -0,0 +1,28 @@
+class StatusPoller:
+    """Picks when to poll the now-playing status next.
+
+    While a track plays, the next change is predictable from ``progress_ms``
+    and ``duration_ms``, so the poll is scheduled just after the track ends
+    (capped at ``max_wait``, which bounds how late a skip or seek is seen).
+    Paused playback and ads are polled on the short ``interval``; when the
+    user is offline the delay doubles up to ``max_backoff``.
+    """
+
+    def __init__(self, interval: float, max_wait: float, max_backoff: float):
+        self.interval = interval
+        self.max_wait = max_wait
+        self.max_backoff = max_backoff
+        self.offline_polls = 0
+
+    def next_delay(self, data: dict | None) -> float:
+        if not data:
+            self.offline_polls += 1
+            return min(self.interval * 2**self.offline_polls, self.max_backoff)
+        self.offline_polls = 0
+
+        item = data.get("item")
+        progress = data.get("progress_ms")
+        if not data.get("is_playing") or not item or progress is None:
+            return self.interval
+        remaining = (item["duration_ms"] - progress) / 1000
+        return max(1.0, min(remaining + 1, self.max_wait))
@@ -0,0 +1,139 @@
+import os
+
+import config
+from net import make_retry, session
+from constructor import make_sections
+from history import HistoryStore
+from toplist import Charts
+from polling import StatusPoller
+from publisher import Publisher
+from settings import (
+    github_api_url,
+    http_timeout,
+    profiles,
+    refresh_intervals,
+    spotify_api_url,
+    status_max_backoff,
+    status_max_wait,
+    top_capacity,
+    top_source,
+    top_window,
+)
+
+# per-profile settings; a profile entry may override any of them
+PROFILE_KEYS = (
+    "username",
+    "user_url",
+    "client_id",
+    "client_secret",
+    "redirect_uri",
+    "limit",
+    "github_token",
+    "github_reponame",
+    "discord_url",
+    "website",
+    "time_range",
+)
+
+TIME_FRAMES = {
+    "long_term": "several years",
+    "medium_term": "last 6 months",
+    "short_term": "this month",
+}
+
+
+class Profile:
+    """One GitHub profile README fed by one Spotify account.
+
+    Holds the account settings, lazily created API clients and the state
+    kept between cycles (README document, sections, publisher, poller).
+    Everything a profile writes lives under its own ``files_dir``.
+    """
+
+    def __init__(self, name: str, files_dir: str, **options) -> None:
+        self.name = name
+        self.files_dir = files_dir
+        for key in PROFILE_KEYS:
+            setattr(self, key, options[key])
+        if top_source == "local":
+            self.time_frame = f"last {round(top_window / 86400)} days"
+        else:
+            self.time_frame = TIME_FRAMES.get(self.time_range)
+        self.token_path = options.get("token_path", ".cache")
+        os.makedirs(files_dir, exist_ok=True)
+
+        self._sp = None
+        self._github = None
+        self.readme = None
+        self.unstaged = False  # README saved but not yet staged for a commit
+        self.triggered = set()  # jobs asked for through the trigger, see app.py
+        self.history = HistoryStore(self.path("history.db"))
+        self.charts = Charts(self.history, window=top_window, capacity=top_capacity)
+        self.sections = make_sections()
+        self.publisher = Publisher(
+            lambda: self.github,
+            self.github_reponame,
+            self.github_token,
+            state_path=self.path("push_state.json"),
+        )
+        self.poller = StatusPoller(
+            interval=refresh_intervals["status"],
+            max_wait=status_max_wait,
+            max_backoff=status_max_backoff,
+        )
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.files_dir, filename)
+
+    @property
+    def sp(self):
+        if self._sp is None:
+            # spotipy is only loaded once a request misses the caches
+            from auth import make_client
+
+            self._sp = make_client(
+                self.client_id,
+                self.client_secret,
+                self.redirect_uri,
+                cache_path=self.token_path,
+                session=session,
+                timeout=http_timeout,
+                prefix=spotify_api_url,
+            )
+        return self._sp
+
+    @property
+    def github(self):
+        if self._github is None:
+            from github import Github
+
+            # PyGithub keeps its own connection, with the same retry policy
+            self._github = Github(
+                self.github_token,
+                base_url=github_api_url,
+                timeout=http_timeout[1],
+                retry=make_retry(),
+            )
+        return self._github
+
+
+def load_profiles() -> list[Profile]:
+    # without a `profiles` list, config.py itself is the only profile
+    defaults = {key: getattr(config, key, None) for key in PROFILE_KEYS}
+    if not profiles:
+        return [Profile("default", "files", **defaults)]
+
+    loaded = []
+    for options in profiles:
+        files_dir = os.path.join("files", options["name"])
+        loaded.append(
+            Profile(
+                files_dir=files_dir,
+                **{
+                    **defaults,
+                    "token_path": os.path.join(files_dir, ".spotify-token"),
+                    **options,
+                },
+            )
+        )
+    return loaded
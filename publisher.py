@@ -0,0 +1,211 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+from helpers import write_atomic
+from metrics import api_call
+from net import session
+from settings import commit_interval, github_api_url, max_staleness, push_revalidate
+
+
+def blob_sha(content: bytes) -> str:
+    # the sha GitHub reports for a file with this content
+    header = f"blob {len(content)}\0".encode()
+    return hashlib.sha1(header + content).hexdigest()
+
+
+class Publisher:
+    """Pushes README.md and its assets to the profile repository.
+
+    Keeps the blob sha of every remote file it manages, so content that is
+    already pushed is detected locally with no request at all. The remote
+    is only asked again (with a conditional ETag request) when a commit is
+    rejected or every ``push_revalidate`` seconds in case it was edited
+    elsewhere.
+
+    Changed files are staged and committed together through the Git Data
+    API. A commit is made once nothing new was staged for
+    ``commit_interval`` seconds, so a burst of changes becomes one commit
+    and commits are at least that far apart, or once the oldest staged
+    change has waited ``max_staleness`` seconds, so a steady stream of
+    changes is still pushed.
+    """
+
+    def __init__(
+        self,
+        connect,
+        reponame: str,
+        token: str,
+        state_path: str,
+        branch: str = "main",
+    ):
+        self.connect = connect  # returns the PyGithub client, called once
+        self.reponame = reponame
+        self.token = token
+        self.branch = branch
+        self.state_path = state_path
+        self.files = {}  # path -> {"sha", "etag", "checked_at"}
+        self.pending = {}  # path -> content bytes
+        self.pending_since = None  # when the oldest pending change was staged
+        self.staged_at = None  # when the newest one was
+        self.last_commit = 0.0
+        self.max_staleness = max_staleness
+        if max_staleness < commit_interval:
+            # a shorter bound would cut every batch short of commit_interval
+            logging.warning(
+                f"max_staleness ({max_staleness}s) is shorter than "
+                f"commit_interval ({commit_interval}s), using {commit_interval}s.\n"
+            )
+            self.max_staleness = commit_interval
+        self._repo = None
+        self._load_state()
+
+    @property
+    def repo(self):
+        if self._repo is None:
+            self._repo = self._call("get_repo", self.connect().get_repo, self.reponame)
+        return self._repo
+
+    def _load_state(self) -> None:
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable push state: {e}\n")
+            return
+        if state.get("reponame") == self.reponame:
+            self.files = state.get("files", {})
+            self.last_commit = state.get("last_commit", 0.0)
+
+    def _save_state(self) -> None:
+        state = {
+            "reponame": self.reponame,
+            "files": self.files,
+            "last_commit": self.last_commit,
+        }
+        try:
+            write_atomic(self.state_path, json.dumps(state))
+        except OSError as e:
+            logging.warning(f"Could not save push state: {e}\n")
+
+    def refresh(self, path: str) -> None:
+        # conditional request, a 304 does not count against the rate limit;
+        # the entry is only replaced once the request succeeded
+        known = dict(self.files.get(path) or {"sha": None, "etag": None})
+        headers = {"Authorization": f"token {self.token}"}
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        response = session.get(
+            f"{github_api_url}/repos/{self.reponame}/contents/{path}",
+            params={"ref": self.branch},
+            headers=headers,
+        )
+        if response.status_code == 404:
+            known["sha"], known["etag"] = None, None
+        elif response.status_code != 304:
+            response.raise_for_status()
+            known["sha"] = response.json()["sha"]
+            known["etag"] = response.headers.get("ETag")
+        known["checked_at"] = time.time()
+        self.files[path] = known
+        self._save_state()
+
+    def remote_sha(self, path: str) -> str | None:
+        known = self.files.get(path)
+        # entries saved without checked_at by older versions are refreshed
+        checked_at = known.get("checked_at", 0) if known else 0
+        if time.time() - checked_at >= push_revalidate:
+            self.refresh(path)
+        return self.files[path]["sha"]
+
+    def stage(self, path: str, content: str | bytes) -> bool:
+        # queue a file for the next commit if it differs from the remote
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        if blob_sha(content) == self.remote_sha(path):
+            self.pending.pop(path, None)
+            if not self.pending:
+                self.pending_since = self.staged_at = None
+            return False
+        if self.pending.get(path) != content:
+            self.pending[path] = content
+            self.staged_at = time.time()
+            if self.pending_since is None:
+                self.pending_since = self.staged_at
+        return True
+
+    def due(self) -> bool:
+        if not self.pending:
+            return False
+        now = time.time()
+        return (
+            now - self.staged_at >= commit_interval
+            or now - self.pending_since >= self.max_staleness
+        )
+
+    def flush(self, force: bool = False) -> bool:
+        if not self.pending or not (force or self.due()):
+            return False
+        from github import GithubException
+
+        try:
+            self._commit()
+        except GithubException as e:
+            # most likely the branch moved, look again and retry once
+            logging.warning(f"Commit rejected ({e.status}), refreshing file shas.\n")
+            for path in list(self.pending):
+                self.refresh(path)
+                self.stage(path, self.pending[path])
+            if not self.pending:
+                return False
+            self._commit()
+        self.pending.clear()
+        self.pending_since = self.staged_at = None
+        self.last_commit = time.time()
+        self._save_state()
+        return True
+
+    def _call(self, endpoint: str, method, *args, **kwargs):
+        # PyGithub keeps its own connection, its calls are rate limited and
+        # recorded here
+        session.throttle(github_api_url)
+        with api_call(f"github.{endpoint}"):
+            return method(*args, **kwargs)
+
+    def _commit(self) -> None:
+        # blobs -> tree -> commit -> ref update, one commit for every file
+        from github import InputGitTreeElement
+
+        repo = self.repo
+        ref = self._call("get_git_ref", repo.get_git_ref, f"heads/{self.branch}")
+        parent = self._call("get_git_commit", repo.get_git_commit, ref.object.sha)
+        elements = []
+        for path, content in self.pending.items():
+            if path.endswith(".md"):
+                data, encoding = content.decode("utf-8"), "utf-8"
+            else:
+                data, encoding = base64.b64encode(content).decode("ascii"), "base64"
+            blob = self._call("create_git_blob", repo.create_git_blob, data, encoding)
+            elements.append(InputGitTreeElement(path, "100644", "blob", sha=blob.sha))
+        tree = self._call(
+            "create_git_tree", repo.create_git_tree, elements, base_tree=parent.tree
+        )
+        if "README.md" in self.pending:
+            message = "`Update:` Spotify stats."
+        else:
+            message = f"`Update:` {', '.join(self.pending)}."
+        commit = self._call(
+            "create_git_commit", repo.create_git_commit, message, tree, [parent]
+        )
+        self._call("update_ref", ref.edit, commit.sha)
+        for path, content in self.pending.items():
+            self.files[path] = {
+                "sha": blob_sha(content),
+                "etag": None,
+                "checked_at": time.time(),
+            }
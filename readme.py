@@ -0,0 +1,111 @@
+import logging
+import os
+
+from helpers import read_write_file
+
+# name: (start marker, end marker); a section spans both markers inclusive.
+SECTIONS = {
+    "status": ("<p status, align='center'>", "</p status>"),
+    "recentlyplayed": ("<p recentlyplayed, float='left'>", "</p recentlyplayed>"),
+    "topartists": ("<p topartists, float='left'>", "</p topartists>"),
+    "topsongs": ("<p topsongs, float='left' >", "</p topsongs>"),
+    "mood": ("<td>Music Mood is", "Music</td>"),
+    "layout": ("<img src='https://img.shields.io/badge/Layout-", "class='layout'>"),
+    "quote": ("<h4 align='center'>", "</a>.</h4>"),
+}
+
+
+class Readme:
+    """In-memory README split into static text and named sections.
+
+    The file is parsed once; updaters swap whole sections in place and the
+    document is serialized and written at most once per cycle.
+    """
+
+    def __init__(self, path: str, text: str) -> None:
+        self.path = path
+        self.dirty = False
+        self._mtime = None
+        self._parse(text)
+
+    @classmethod
+    def load(cls, path: str) -> "Readme":
+        readme = cls(path, read_write_file(file_path=path, mode="r"))
+        readme._mtime = os.stat(path).st_mtime_ns
+        return readme
+
+    def _parse(self, text: str) -> None:
+        spans = []
+        for name, (start, end) in SECTIONS.items():
+            startblock = text.find(start)
+            if startblock == -1:
+                continue
+            endblock = text.find(end, startblock)
+            if endblock == -1:
+                continue
+            spans.append((startblock, endblock + len(end), name))
+        spans.sort()
+
+        # static text sits at even positions, sections at odd positions
+        self.parts = []
+        self.index = {}
+        position = 0
+        for startblock, endblock, name in spans:
+            if startblock < position:
+                raise ValueError(f"Section '{name}' overlaps another section.")
+            self.parts.append(text[position:startblock])
+            self.index[name] = len(self.parts)
+            self.parts.append(text[startblock:endblock])
+            position = endblock
+        self.parts.append(text[position:])
+        self._text = text
+
+    def get(self, name: str) -> str:
+        if name not in self.index:
+            raise ValueError(f"Section '{name}' was not found in {self.path}.")
+        return self.parts[self.index[name]]
+
+    def replace(self, name: str, content: str) -> bool:
+        if name not in self.index:
+            raise ValueError(f"Section '{name}' was not found in {self.path}.")
+        position = self.index[name]
+        if self.parts[position] == content:
+            return False
+        self.parts[position] = content
+        self._text = None
+        self.dirty = True
+        return True
+
+    def replace_block(self, start: str, end: str, content: str) -> None:
+        # for blocks that wrap other sections (e.g. the page header); reparses
+        text = self.text()
+        startblock = text.index(start)
+        endblock = text.index(end, startblock)
+        new_text = text[:startblock] + content + text[endblock + len(end) :]
+        if new_text != text:
+            self._parse(new_text)
+            self.dirty = True
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self.parts)
+        return self._text
+
+    def save(self) -> bool:
+        if not self.dirty:
+            return False
+        read_write_file(file_path=self.path, mode="w", data=self.text())
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self.dirty = False
+        return True
+
+    def reload_if_changed(self) -> bool:
+        # pick up hand edits to the template without rereading it every cycle
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        self._parse(read_write_file(file_path=self.path, mode="r"))
+        self._mtime = mtime
+        self.dirty = False
+        logging.info(f"{self.path} changed on disk, reloaded.\n")
+        return True
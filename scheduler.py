@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Scheduler:
+    """Runs named jobs on their own cadence from a heap of due times.
+
+    Jobs that fall due together are handed to the handler in one call, so
+    their requests can still be fetched concurrently and pushed once. With
+    ``group``, due jobs are split into one call per group key; with
+    ``workers``, those calls run on a bounded pool so a slow group does not
+    hold back the others. A job goes back on the heap only once its call
+    returned, so it never runs twice at the same time, and jobs of a group
+    that is still running are held until its call returns. Scheduling a job
+    that is already waiting keeps the earlier due time, so a burst of
+    requests to run it soon collapses into one run.
+
+    ``due_times`` reports when every job is next due in wall-clock time, so
+    the schedule can be saved and resumed with ``every(..., delay=...)``.
+    """
+
+    def __init__(self, jitter: float = 0.0, workers: int = 0, group=None) -> None:
+        self.jitter = jitter  # fraction of the interval added at random
+        self.group = group
+        self.intervals = {}
+        self._heap = []  # (due, seq, name)
+        self._pending = {}  # name -> (due, seq) of its entry on the heap
+        self._due = {}  # name -> unix time it was last scheduled for
+        self._seq = itertools.count()
+        self._stopped = False
+        self._wakeup = threading.Condition()
+        self._shutdown_hooks = []
+        self._run_hooks = []
+        self._running = set()  # group keys with a call in flight
+        self._held = {}  # group key -> names due while it was running
+        self._pool = None
+        if workers:
+            self._pool = ThreadPoolExecutor(workers, thread_name_prefix="job")
+
+    def every(self, name, interval: float, delay: float = 0.0) -> None:
+        self.intervals[name] = interval
+        self.schedule(name, delay)
+
+    def schedule(self, name, delay: float) -> None:
+        due = time.monotonic() + delay
+        with self._wakeup:
+            pending = self._pending.get(name)
+            if pending is not None and pending[0] <= due:
+                return
+            # an entry replaced by an earlier one is skipped once it comes up
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (due, seq, name))
+            self._pending[name] = (due, seq)
+            self._due[name] = time.time() + delay
+            self._wakeup.notify()
+
+    def due_times(self) -> dict:
+        # jobs that are running report the time they fell due
+        with self._wakeup:
+            return dict(self._due)
+
+    def on_shutdown(self, hook) -> None:
+        self._shutdown_hooks.append(hook)
+
+    def after_run(self, hook) -> None:
+        # hook(names) is called once the jobs of a call are scheduled again
+        self._run_hooks.append(hook)
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+
+    def _pop_due(self) -> list:
+        now = time.monotonic()
+        names = []
+        while self._heap and self._heap[0][0] <= now:
+            due, seq, name = heapq.heappop(self._heap)
+            if self._pending.get(name) == (due, seq):
+                del self._pending[name]
+                names.append(name)
+        return names
+
+    def _next_due(self) -> list:
+        # block until some jobs are due, or return [] once stopped
+        with self._wakeup:
+            while not self._stopped:
+                names = self._pop_due()
+                if names:
+                    return names
+                wait = self._heap[0][0] - time.monotonic() if self._heap else None
+                self._wakeup.wait(wait)
+            return []
+
+    def _submit(self, handler, key, names: list) -> None:
+        # called with the lock held
+        if key in self._running:
+            held = self._held.setdefault(key, [])
+            held.extend(name for name in names if name not in held)
+            return
+        self._running.add(key)
+        self._pool.submit(self._run_group, handler, key, names)
+
+    def _run_group(self, handler, key, names: list) -> None:
+        while names:
+            self._run(handler, names)
+            with self._wakeup:
+                names = self._held.pop(key, [])
+                if not names or self._stopped:
+                    self._running.discard(key)
+                    return
+
+    def _run(self, handler, names: list) -> None:
+        delays = {}
+        try:
+            # the handler may return {name: seconds} to override a cadence
+            delays = handler(names) or {}
+        except Exception as e:
+            logging.error(f"Error running {', '.join(map(str, names))}: {e}\n")
+        for name in names:
+            if name in delays:
+                self.schedule(name, delays[name])
+            else:
+                jitter = random.uniform(0, self.jitter)
+                self.schedule(name, self.intervals[name] * (1 + jitter))
+        for hook in self._run_hooks:
+            try:
+                hook(names)
+            except Exception as e:
+                logging.error(f"Error in run hook: {e}\n")
+
+    def run(self, handler) -> None:
+        try:
+            while names := self._next_due():
+                batches = {}
+                for name in names:
+                    key = self.group(name) if self.group else None
+                    batches.setdefault(key, []).append(name)
+                for key, batch in batches.items():
+                    if self._pool is None:
+                        self._run(handler, batch)
+                    else:
+                        with self._wakeup:
+                            self._submit(handler, key, batch)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            for hook in self._shutdown_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    logging.error(f"Error in shutdown hook: {e}\n")
@@ -0,0 +1,67 @@
+from templates import fingerprint
+
+
+class Section:
+    """A README section rendered from the fetched datasets it ``needs``.
+
+    ``render(profile, *data)`` and ``key(*data)`` get one value per needed
+    dataset, in order. A fingerprint of the data last rendered is kept; new
+    data with the same fingerprint leaves the section clean, so it is not
+    rendered again, unless its last fetch or render failed: then the next
+    data is rendered whatever its fingerprint, so the failure clears once a
+    fetch succeeds again. ``key`` picks the parts of the data the rendering
+    depends on, and sections with ``layout`` set count towards the layout
+    sync badge; a table that could not be filled leaves them unhealthy
+    without being rendered again for the same data.
+    """
+
+    def __init__(self, name, needs, render, key=None, layout=False) -> None:
+        self.name = name
+        self.needs = tuple(needs)
+        self.render = render
+        self.key = key
+        self.layout = layout
+        self.data = None
+        self.fingerprint = None
+        self.dirty = False
+        self.healthy = True
+        self.failed = False
+
+    def update(self, data: tuple) -> bool:
+        key = fingerprint(self.key(*data) if self.key else data)
+        if key != self.fingerprint or self.failed:
+            self.data = data
+            self.fingerprint = key
+            self.dirty = True
+        return self.dirty
+
+    def fail(self) -> None:
+        self.healthy = False
+        self.failed = True
+
+    def invalidate(self) -> None:
+        # render again on the next apply, e.g. after the README was reloaded;
+        # a section restored from a snapshot has no data until the next fetch
+        if self.data is None:
+            self.fingerprint = None
+        self.dirty = self.fingerprint is not None
+
+    def restore(self, fingerprint: str | None, healthy: bool) -> None:
+        # what a previous run rendered into the README, see snapshot.py
+        self.fingerprint = fingerprint
+        self.healthy = healthy
+        # rendered once more after a restart, whatever made it unhealthy
+        self.failed = not healthy
+
+    def apply(self, profile):
+        self.dirty = False
+        try:
+            result = self.render(profile, *self.data)
+        except Exception:
+            self.healthy = False
+            self.failed = True
+            raise
+        self.failed = False
+        # layout sections report whether their table could be filled
+        self.healthy = bool(result) if self.layout else True
+        return result
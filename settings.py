@@ -0,0 +1,60 @@
+import config
+
+# Optional settings. Older config.py files may not define them, so each one
+# falls back to a default here; see example.config.py for what they do.
+
+cache_ttl = getattr(
+    config,
+    "cache_ttl",
+    {
+        "playing": 0,
+        "recently_played": 60,
+        "top_artists": 3600,
+        "top_songs": 3600,
+    },
+)
+cache_size = getattr(config, "cache_size", 128)
+cache_path = getattr(config, "cache_path", "files/cache.json")
+fetch_workers = getattr(config, "fetch_workers", 5)
+fetch_timeout = getattr(config, "fetch_timeout", 8)
+features_path = getattr(config, "features_path", "files/features.db")
+push_revalidate = getattr(config, "push_revalidate", 3600)
+commit_interval = getattr(config, "commit_interval", 15)
+max_staleness = getattr(config, "max_staleness", 60)
+refresh_intervals = getattr(
+    config,
+    "refresh_intervals",
+    {"status": 10, "recents": 60, "tops": 3600, "quote": 86400, "push": 10},
+)
+refresh_jitter = getattr(config, "refresh_jitter", 0.1)
+status_max_wait = getattr(config, "status_max_wait", 30)
+status_max_backoff = getattr(config, "status_max_backoff", 300)
+asset_mode = getattr(config, "asset_mode", "original")
+thumbnail_width = getattr(config, "thumbnail_width", 160)
+profiles = getattr(config, "profiles", [])
+profile_workers = getattr(config, "profile_workers", 4)
+http_timeout = getattr(config, "http_timeout", (3.05, 10))
+http_retries = getattr(config, "http_retries", 3)
+http_pool_size = getattr(config, "http_pool_size", 10)
+rate_limits = getattr(
+    config,
+    "rate_limits",
+    {
+        "api.spotify.com": (10, 20),
+        "api.github.com": (5, 10),
+        "zenquotes.io": (1, 2),
+    },
+)
+metrics_port = getattr(config, "metrics_port", None)
+metrics_path = getattr(config, "metrics_path", None)
+spotify_api_url = getattr(config, "spotify_api_url", "https://api.spotify.com/v1/")
+github_api_url = getattr(config, "github_api_url", "https://api.github.com")
+quote_url = getattr(config, "quote_url", "https://zenquotes.io/api/quotes")
+top_source = getattr(config, "top_source", "api")
+top_window = getattr(config, "top_window", 28 * 86400)
+top_capacity = getattr(config, "top_capacity", 1000)
+mood_window = getattr(config, "mood_window", 7 * 86400)
+avatar_refresh = getattr(config, "avatar_refresh", 86400)
+trigger_port = getattr(config, "trigger_port", None)
+trigger_socket = getattr(config, "trigger_socket", None)
+trigger_debounce = getattr(config, "trigger_debounce", 1.0)
@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+
+from helpers import write_atomic
+from templates import fingerprint
+
+# jobs refreshed at least this often run soon after a restart anyway, their
+# due times are not worth a disk write
+MIN_INTERVAL = 60
+
+_saved = {}  # state path -> what was last written, to skip unchanged saves
+
+
+def _state_path(profile) -> str:
+    return profile.path("state.json")
+
+
+def _rendered(profile, name: str) -> str | None:
+    readme = profile.readme
+    return fingerprint(readme.get(name)) if name in readme.index else None
+
+
+def restore(profile) -> dict:
+    """Resume a profile from the snapshot of its previous run.
+
+    A section takes over the fingerprint of the data it last rendered only
+    if the README still holds what it rendered then, so after a restart
+    unchanged data is neither rendered nor pushed again. Returns the saved
+    {job: unix time it is due}.
+    """
+    path = _state_path(profile)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable snapshot {path}: {e}\n")
+        return {}
+
+    sections = state.get("sections", {})
+    for section in profile.sections:
+        data, healthy, rendered = sections.get(section.name, (None, True, None))
+        if rendered is not None and rendered == _rendered(profile, section.name):
+            section.restore(data, healthy)
+    return state.get("due", {})
+
+
+def save(profile, due: dict, intervals: dict) -> None:
+    # called after every run of a job; only writes when a section or the due
+    # time of a slower job changed, so an idle profile leaves the disk alone
+    path = _state_path(profile)
+    due = {
+        job: at for job, at in due.items() if intervals.get(job, 0) >= MIN_INTERVAL
+    }
+    key = (
+        [(section.fingerprint, section.healthy) for section in profile.sections],
+        due,
+    )
+    if _saved.get(path) == key:
+        return
+    state = {
+        "sections": {
+            section.name: [
+                section.fingerprint,
+                section.healthy,
+                _rendered(profile, section.name),
+            ]
+            for section in profile.sections
+        },
+        "due": due,
+    }
+    try:
+        write_atomic(path, json.dumps(state))
+        _saved[path] = key
+    except OSError as e:
+        logging.warning(f"Could not save the snapshot of {profile.name}: {e}\n")
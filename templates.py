@@ -0,0 +1,47 @@
+import hashlib
+import html
+from string import Formatter
+
+
+class Markup(str):
+    # already rendered HTML, inserted into a template without escaping
+    pass
+
+
+class Template:
+    """A ``{field}`` template split into literals and fields once.
+
+    Rendering is a single join; values are HTML-escaped unless they are
+    Markup. Fields are looked up in the keyword arguments first and then as
+    attributes of ``record``.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.parts = []
+        for literal, field, _, _ in Formatter().parse(source):
+            if literal:
+                self.parts.append((literal, None))
+            if field is not None:
+                self.parts.append((None, field))
+
+    def render(self, record=None, **values) -> Markup:
+        out = []
+        for literal, field in self.parts:
+            if field is None:
+                out.append(literal)
+                continue
+            value = values[field] if field in values else getattr(record, field)
+            if isinstance(value, Markup):
+                out.append(value)
+            else:
+                out.append(html.escape(str(value)))
+        return Markup("".join(out))
+
+    def render_each(self, records) -> Markup:
+        return Markup("".join(self.render(record) for record in records))
+
+
+def fingerprint(records) -> str:
+    # stable across runs for JSON payloads, tuples and frozen dataclass records
+    return hashlib.sha1(repr(records).encode("utf-8")).hexdigest()
+
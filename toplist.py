@@ -0,0 +1,116 @@
+import math
+import threading
+
+RENORMALIZE = 30.0  # rescale the scores before exp() gets anywhere near overflow
+
+
+class DecayedTop:
+    """Items ranked by a play count that decays over ``window`` seconds.
+
+    Uses forward decay: a play at time t adds exp((t - t0) / window), so
+    every score decays at the same rate and the ranking only changes for
+    the item that was just played. The ranking is kept sorted as plays come
+    in, which makes a top-k query a slice of k items. At most ``capacity``
+    items are tracked; the lowest ranked one is dropped to make room.
+    """
+
+    def __init__(self, window: float, capacity: int = 1000) -> None:
+        self.window = window
+        self.capacity = capacity
+        self.scores = {}
+        self.order = []  # keys, highest score first
+        self.positions = {}  # key -> index in order
+        self.t0 = None
+
+    def _renormalize(self, at: float) -> None:
+        factor = math.exp(-(at - self.t0) / self.window)
+        for key in self.scores:
+            self.scores[key] *= factor
+        self.t0 = at
+
+    def add(self, key, at: float, weight: float = 1.0) -> None:
+        if self.t0 is None:
+            self.t0 = at
+        elif (at - self.t0) / self.window > RENORMALIZE:
+            self._renormalize(at)
+
+        if key not in self.scores:
+            self.scores[key] = 0.0
+            self.positions[key] = len(self.order)
+            self.order.append(key)
+        score = self.scores[key] + weight * math.exp((at - self.t0) / self.window)
+        self.scores[key] = score
+
+        # bubble the key up to its new rank
+        position = self.positions[key]
+        while position > 0 and self.scores[self.order[position - 1]] < score:
+            above = self.order[position - 1]
+            self.order[position] = above
+            self.positions[above] = position
+            position -= 1
+        self.order[position] = key
+        self.positions[key] = position
+
+        while len(self.order) > self.capacity:
+            dropped = self.order.pop()
+            del self.scores[dropped]
+            del self.positions[dropped]
+
+    def top(self, n: int) -> list:
+        return self.order[:n]
+
+
+class Charts:
+    """Top tracks and artists of one profile, fed from its listening history.
+
+    ``update`` only reads the plays stored since the previous call, so the
+    charts follow the history without rereading it. Queries rank over
+    ``window`` seconds unless they ask for another window; the first query
+    for a window builds its ranking from the stored history once, after
+    that it follows new plays like the others and answers in O(k).
+    """
+
+    def __init__(self, history, window: float, capacity: int = 1000) -> None:
+        self.history = history
+        self.window = window
+        self.capacity = capacity
+        self.rankings = {}  # window -> (tracks, artists)
+        self.cursor = 0  # played_at of the last play counted
+        self._lock = threading.Lock()
+
+    def _count(self, rankings, plays) -> None:
+        for played_at, track_id, artist_id in plays:
+            at = played_at / 1000
+            for tracks, artists in rankings:
+                tracks.add(track_id, at)
+                if artist_id:
+                    artists.add(artist_id, at)
+
+    def _ranking(self, window: float | None) -> tuple:
+        window = window or self.window
+        if window not in self.rankings:
+            ranking = (
+                DecayedTop(window, self.capacity),
+                DecayedTop(window, self.capacity),
+            )
+            # the plays counted so far, newer ones come with the next update
+            plays = self.history.plays(0) if self.cursor else []
+            self._count([ranking], (p for p in plays if p[0] <= self.cursor))
+            self.rankings[window] = ranking
+        return self.rankings[window]
+
+    def update(self) -> None:
+        with self._lock:
+            self._ranking(None)
+            plays = self.history.plays(self.cursor)
+            self._count(self.rankings.values(), plays)
+            if plays:
+                self.cursor = plays[-1][0]
+
+    def top_tracks(self, n: int, window: float | None = None) -> list:
+        with self._lock:
+            return self._ranking(window)[0].top(n)
+
+    def top_artists(self, n: int, window: float | None = None) -> list:
+        with self._lock:
+            return self._ranking(window)[1].top(n)
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import socketserver
+import stat
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from settings import trigger_port, trigger_socket
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _make_handler(refresh):
+    # http.server is only imported when the trigger is enabled
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            url = urlsplit(self.path)
+            if url.path != "/refresh":
+                self.send_error(404)
+                return
+            query = parse_qs(url.query)
+            try:
+                scheduled = refresh(query.get("profile", []), query.get("section", []))
+            except KeyError as e:
+                self._reply(404, {"error": f"Unknown {e.args[0]}"})
+                return
+            self._reply(202, {"scheduled": scheduled})
+
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    return Handler
+
+
+def _start(server, name: str):
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return server
+
+
+def serve(
+    refresh,
+    port: int | None = trigger_port,
+    path: str | None = trigger_socket,
+    host: str = "127.0.0.1",
+) -> list:
+    """Accept refresh requests from local tools, from daemon threads.
+
+    ``POST /refresh?section=<name>&profile=<name>`` (both repeatable, both
+    optional) calls ``refresh(profiles, sections)``, which schedules the
+    jobs and returns them for the 202 reply, or raises KeyError for an
+    unknown name. Returns the servers started, to be closed on shutdown.
+    """
+    if not port and not path:
+        return []
+    handler = _make_handler(refresh)
+    servers = []
+    if port:
+        from http.server import ThreadingHTTPServer
+
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        servers.append(_start(server, "trigger"))
+        logging.info(f"Accepting refresh triggers on http://{host}:{port}/refresh\n")
+    if path:
+        # a socket left behind by an earlier run would make bind fail
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        servers.append(_start(_UnixServer(path, handler), "trigger-socket"))
+        logging.info(f"Accepting refresh triggers on {path}\n")
+    return servers
+
+
+def close(servers: list) -> None:
+    for server in servers:
+        server.shutdown()
+        server.server_close()